@@ -1,6 +1,9 @@
 const API_BASE = '/api';
+const MAX_BUSY_RETRY_SECONDS = 5;
 
-async function fetchJson(url, options = {}) {
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function fetchJson(url, options = {}, retryBusy = true) {
   let response;
   try {
     response = await fetch(`${API_BASE}${url}`, {
@@ -17,6 +20,15 @@ async function fetchJson(url, options = {}) {
     throw err;
   }
 
+  // Server is shedding load: honour Retry-After once before giving up
+  if (response.status === 429 && retryBusy) {
+    const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+    if (retryAfter <= MAX_BUSY_RETRY_SECONDS) {
+      await sleep(retryAfter * 1000);
+      return fetchJson(url, options, false);
+    }
+  }
+
   let data;
   try {
     data = await response.json();
@@ -40,7 +52,20 @@ async function fetchJson(url, options = {}) {
 export const api = {
   // Health & Stats
   health: () => fetchJson('/health'),
-  getLogs: (limit = 200) => fetchJson(`/logs?limit=${limit}`),
+  getLogs: (limit = 200, params = {}) => {
+    const query = new URLSearchParams({ limit, ...params }).toString();
+    return fetchJson(`/logs?${query}`);
+  },
+  // Live log records (server-sent events); the caller closes the EventSource
+  streamLogs: (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    return new EventSource(`${API_BASE}/logs/stream${query ? `?${query}` : ''}`);
+  },
+  getSlowRequests: (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    return fetchJson(`/diagnostics/slow${query ? `?${query}` : ''}`);
+  },
+  getSlowRequest: (requestId) => fetchJson(`/diagnostics/slow/${requestId}`),
   getStats: () => fetchJson('/stats'),
   getQuickStats: () => fetchJson('/stats/quick'),
 
@@ -66,6 +91,8 @@ export const api = {
   // Server-specific endpoints
   getServerInfo: (serverId) => fetchJson(`/servers/${serverId}/info`),
 
+  getServersHealth: () => fetchJson('/servers/health'),
+
   testServer: (serverId) => fetchJson(`/servers/${serverId}/info`),
 
   getUsers: (serverId) => fetchJson(`/servers/${serverId}/users`),
@@ -158,6 +185,20 @@ export const api = {
     body: JSON.stringify(payload)
   }),
 
+  bulkApplyEmbyLayout: (serverId, payload) => fetchJson(`/emby/${serverId}/layouts/bulk-apply`, {
+    method: 'POST',
+    body: JSON.stringify(payload)
+  }),
+
+  captureEmbyLayouts: (serverId, payload = {}) => fetchJson(`/emby/${serverId}/layouts/capture`, {
+    method: 'POST',
+    body: JSON.stringify(payload)
+  }),
+
+  getOperations: (limit = 30) => fetchJson(`/operations?limit=${limit}`),
+
+  getOperation: (operationId) => fetchJson(`/operations/${operationId}`),
+
   createEmbyLayoutTemplate: (payload) => fetchJson('/emby/layouts/template', {
     method: 'POST',
     body: JSON.stringify(payload)
@@ -165,6 +206,8 @@ export const api = {
 
   getEmbyLayoutTemplates: () => fetchJson('/emby/layouts/templates'),
 
+  getEmbyLayoutTemplate: (templateId) => fetchJson(`/emby/layouts/template/${templateId}`),
+
   deleteEmbyLayoutTemplate: (templateId) => fetchJson(`/emby/layouts/template/${templateId}`, {
     method: 'DELETE'
   })
@@ -1,17 +1,53 @@
-from flask import Flask, jsonify, request, Response, send_from_directory
+from flask import Flask, g, jsonify, request, Response, send_from_directory
 from flask_cors import CORS
-import requests
 import os
+import atexit
 import logging
 from logging.handlers import RotatingFileHandler
 import sys
 from functools import wraps
-from collections import deque
 import json
 import platform
-
+import asyncio
+import concurrent.futures
+import contextvars
+import time
+import math
+from datetime import datetime, timezone
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
+
+from favarr.admin import admin_required
+from favarr.admission import admission_state, detach as detach_admission, init_app as init_admission
+from favarr.aio import async_server_request, gather_async, submit_async
+from favarr.cache import MemoryCacheBackend, SQLiteCacheBackend
 from favarr.extensions import db
-from favarr.models import AppSettings, Server, StatsSnapshot, EmbyLayoutTemplate
+from favarr.logs import LogFilter, RingBufferHandler, log_files, parse_record, tail as tail_logs
+from favarr.metrics import (
+    PUBLISH_INTERVAL as METRICS_PUBLISH_INTERVAL,
+    init_app as init_metrics,
+    observe_job,
+    publish as publish_metrics,
+    render as render_metrics,
+)
+from favarr.profiling import (
+    MAX_ARMED_REQUESTS,
+    MODES as PROFILE_MODES,
+    arm as arm_profiler,
+    armed_routes,
+    disarm as disarm_profiler,
+    init_app as init_profiling,
+    list_profiles,
+    profile_directory,
+)
+from favarr import memory
+from favarr.migrations import move_layout_blobs, upgrade_schema
+from favarr.scheduler import get_scheduler, scheduler_started
+from favarr.timing import EXPOSED_HEADERS as TIMING_HEADERS, SLOW_REQUEST_SECONDS, init_app as init_timing
+from favarr.models import (
+    AppSettings, BulkOperation, Server, ServerHealthSample, SlowRequest, StatsSnapshot, EmbyLayoutTemplate,
+    LayoutBlob
+)
 from favarr.services import (
     abs_add_item_to_collection,
     abs_collection_id,
@@ -29,19 +65,39 @@ from favarr.services import (
     abs_item_library_id,
     abs_map_item,
     abs_progress_to_played,
-    get_server_headers,
+    DeadlineExceeded,
+    circuit_breaker_state,
+    get_response_cache,
+    inflight_reads,
     normalize_abs_collections,
     normalize_abs_items,
     normalize_abs_users,
     plex_item_played,
+    pool_registry,
+    record_server_health,
+    refresh_idle_pools,
+    reset_circuit_breaker,
+    reset_deadline,
+    reset_server_state,
+    server_fetch_image,
+    server_health_state,
+    server_limiter_state,
+    server_pool_state,
     server_request,
+    server_snapshot,
+    set_deadline,
+    set_response_cache,
     stremio_request,
     stremio_library_items,
+    upstream_latency_state,
 )
 from integrations.emby.layouts import (
     apply_layout_template as emby_apply_layout_template,
     get_users as emby_layout_get_users,
     load_all_layouts as emby_load_all_layouts,
+    submit_bulk_apply as emby_submit_bulk_apply,
+    submit_bulk_capture as emby_submit_bulk_capture,
+    validate_layout_template as emby_validate_layout_template,
 )
 
 VERSION = '1.1.4'
@@ -78,7 +134,7 @@ else:
     static_dir = _docker_static  # Fallback, will show clear error if missing
 
 app = Flask(__name__, static_folder=static_dir, static_url_path='')
-CORS(app)
+CORS(app, expose_headers=TIMING_HEADERS)
 
 # Database configuration - store in data_dir for persistence
 db_path = os.path.join(data_dir, 'FaveSwitch.db')
@@ -88,6 +144,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Log directory - store in data_dir for persistence
 log_dir = os.path.join(data_dir, 'logs')
 log_file = os.path.join(log_dir, 'app.log')
+LOG_BACKUP_COUNT = 3
+LOG_STREAM_KEEPALIVE = 15  # seconds between SSE comments on a quiet log
+LOG_STREAM_MAX_SECONDS = 60  # then the client reconnects, freeing the thread
+LOG_STREAM_BACKLOG = 100  # buffered records sent to a new subscriber
 os.makedirs(log_dir, exist_ok=True)
 
 db.init_app(app)
@@ -100,7 +160,7 @@ logging.getLogger('gunicorn.access').setLevel(logging.WARNING)
 formatter = logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
 if not any(isinstance(h, RotatingFileHandler) for h in app.logger.handlers):
-    file_handler = RotatingFileHandler(log_file, maxBytes=2 * 1024 * 1024, backupCount=3)
+    file_handler = RotatingFileHandler(log_file, maxBytes=2 * 1024 * 1024, backupCount=LOG_BACKUP_COUNT)
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
@@ -111,6 +171,14 @@ if not any(isinstance(h, logging.StreamHandler) and h.stream == sys.stdout for h
     stdout_handler.setLevel(logging.INFO)
     app.logger.addHandler(stdout_handler)
 
+# Recent records in memory for /api/logs/stream
+log_buffer = next((h for h in app.logger.handlers if isinstance(h, RingBufferHandler)), None)
+if log_buffer is None:
+    log_buffer = RingBufferHandler()
+    log_buffer.setFormatter(formatter)
+    log_buffer.setLevel(logging.INFO)
+    app.logger.addHandler(log_buffer)
+
 app.logger.setLevel(logging.INFO)
 
 
@@ -165,11 +233,61 @@ print_startup_banner()
 log_service('System', f'FaveSwitch started - Data directory: {data_dir}')
 
 
-# Global state for tracking running collection task
-_stats_collection_task = {
-    'running': False,
-    'snapshot_id': None
-}
+# Upstream response cache shared by all gunicorn workers (FAVARR_CACHE_BACKEND=memory keeps it per process)
+cache_backend_name = os.environ.get('FAVARR_CACHE_BACKEND', 'sqlite').lower()
+cache_db_path = os.path.join(data_dir, 'cache.db')
+# Where the memory backend is saved between restarts (the SQLite file persists by itself)
+cache_snapshot_path = os.path.join(data_dir, 'cache-snapshot.json')
+if cache_backend_name == 'memory':
+    set_response_cache(MemoryCacheBackend())
+else:
+    try:
+        set_response_cache(SQLiteCacheBackend(cache_db_path))
+    except Exception as e:
+        log_service('System', f'Shared cache unavailable ({e}); using per-process cache', level='warning')
+log_service('System', f'Response cache backend: {get_response_cache().name}')
+
+
+def warm_response_cache():
+    """Reload the last run's cache, marked stale so first reads are instant but refreshed."""
+    cache = get_response_cache()
+    try:
+        if isinstance(cache, MemoryCacheBackend):
+            if not os.path.exists(cache_snapshot_path):
+                return
+            loaded = cache.load(cache_snapshot_path)
+        else:
+            cache.expire_all()
+            loaded = cache.stats()['entries']
+        if loaded:
+            log_service('System', f'Warm cache restored: {loaded} entries (stale until refreshed)')
+    except Exception as e:
+        log_service('System', f'Could not restore warm cache: {e}', level='warning')
+
+
+def save_response_cache():
+    """Persist the memory cache for the next start; a no-op for the SQLite backend."""
+    cache = get_response_cache()
+    if not isinstance(cache, MemoryCacheBackend):
+        return
+    try:
+        cache.save(cache_snapshot_path)
+    except Exception as e:
+        app.logger.warning(f'Could not save cache snapshot: {e}')
+
+
+warm_response_cache()
+
+
+# The running stats collection is tracked in the shared cache so every worker sees it
+STATS_COLLECTION_KEY = 'stats:collection'
+STATS_COLLECTION_LEASE = 3600  # seconds; a crashed worker's lease expires after this
+
+
+def running_collection_id():
+    """Snapshot id of the collection in progress on any worker, or None."""
+    value = get_response_cache().get(STATS_COLLECTION_KEY)
+    return int(value) if value else None
 
 
 # Create tables (wrapped to handle race conditions with multiple workers)
@@ -179,42 +297,212 @@ with app.app_context():
         log_service('System', 'Database tables created/verified')
     except Exception:
         pass  # Table already exists from another worker
+    try:
+        added_columns = upgrade_schema()
+        if added_columns:
+            log_service('System', f'Database upgraded: added {", ".join(added_columns)}')
+    except Exception as e:
+        log_service('System', f'Database upgrade failed: {e}', level='error')
+    try:
+        moved = move_layout_blobs()
+        if moved:
+            log_service('System', f'Moved {moved} layout templates to blob storage')
+    except Exception as e:
+        db.session.rollback()
+        log_service('System', f'Layout template migration failed: {e}', level='error')
 
 
-def check_integrations_on_startup():
-    """Log connectivity status for all configured servers on startup."""
+POOL_KEEPALIVE_INTERVAL = 30  # seconds
+CACHE_PURGE_INTERVAL = 300  # seconds
+CACHE_SAVE_INTERVAL = 600  # seconds
+
+
+def start_background_services():
+    """Schedule per-worker background jobs once per process (post_worker_init or the first request)."""
+    if scheduler_started():
+        return
+    scheduler = get_scheduler()
+    scheduler.add_job(
+        refresh_idle_pools, 'interval', seconds=POOL_KEEPALIVE_INTERVAL,
+        id='pool-keepalive', replace_existing=True
+    )
+    scheduler.add_job(
+        lambda: get_response_cache().purge_expired(), 'interval', seconds=CACHE_PURGE_INTERVAL,
+        id='cache-purge', replace_existing=True
+    )
+    scheduler.add_job(
+        save_response_cache, 'interval', seconds=CACHE_SAVE_INTERVAL,
+        id='cache-save', replace_existing=True
+    )
+    # Only serving processes save on exit: a --preload master never fills its cache and
+    # exits last, so its empty snapshot would overwrite the workers' saves.
+    atexit.register(save_response_cache)
+    # One-off, right away: boot never waits on upstream servers
+    scheduler.add_job(check_integrations_on_startup, id='startup-checks', replace_existing=True)
+    scheduler.add_job(
+        run_health_monitor, 'interval', seconds=HEALTH_PROBE_INTERVAL,
+        id='health-monitor', replace_existing=True
+    )
+    scheduler.add_job(
+        lambda: publish_metrics(get_response_cache()), 'interval', seconds=METRICS_PUBLISH_INTERVAL,
+        id='metrics-publish', replace_existing=True
+    )
+    scheduler.add_listener(record_job_duration, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+def record_job_duration(event):
+    """Scheduler listener feeding job durations into /api/metrics."""
+    seconds = (datetime.now(timezone.utc) - event.scheduled_run_time).total_seconds()
+    observe_job(event.job_id, seconds, ok=event.exception is None)
+
+
+@app.before_request
+def ensure_background_services():
+    start_background_services()
+
+
+# Time budget for a request's upstream work; composite endpoints return partial results
+REQUEST_DEADLINE = float(os.environ.get('FAVARR_REQUEST_DEADLINE', '30'))  # seconds, 0 = none
+MAX_REQUEST_DEADLINE = 300  # seconds
+
+
+def requested_deadline():
+    """Deadline in seconds from X-Request-Deadline or ?deadline_ms, else the default; ValueError unless positive."""
+    raw = request.headers.get('X-Request-Deadline') or request.args.get('deadline_ms')
+    if raw:
+        seconds = float(raw) / 1000
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError('Request deadline must be a positive number of milliseconds')
+        return min(seconds, MAX_REQUEST_DEADLINE)
+    return REQUEST_DEADLINE or None
+
+
+@app.before_request
+def start_request_deadline():
+    try:
+        deadline = requested_deadline()
+    except ValueError:
+        return jsonify({'error': 'Request deadline must be a positive number of milliseconds'}), 400
+    g.deadline_token = set_deadline(deadline)
+
+
+@app.teardown_request
+def end_request_deadline(exc=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        try:
+            reset_deadline(token)
+        except ValueError:
+            pass  # torn down in a different context than it was set in
+
+
+# Per-route-class concurrency limits; registered after the deadline so queueing counts against it
+init_timing(app)
+init_metrics(app)
+init_admission(app)
+init_profiling(app, os.path.join(data_dir, 'profiles'))
+memory.init_app(app, os.path.join(data_dir, 'memory'))
+
+
+def partial_result(skipped):
+    """Fields added to a composite response when some of its work was skipped."""
+    return {'partial': True, 'skipped': skipped} if skipped else {}
+
+
+STARTUP_CHECK_LEASE = 300  # seconds; one worker checks, the others read its results
+HEALTH_PROBE_INTERVAL = int(os.environ.get('FAVARR_HEALTH_INTERVAL', '60'))  # seconds
+HEALTH_SAMPLES_PER_SERVER = 1440  # ring size: a day of samples at the default interval
+PROBE_WORKERS = 8
+
+
+def probe_server(server):
+    """Probe one server live; records and returns its health state."""
+    started = time.monotonic()
+    try:
+        info = get_server_info_internal(server, use_cache=False)
+    except Exception as e:
+        return record_server_health(server, 'error', error=str(e))
+    version = info.get('Version') or info.get('ServerName') or 'unknown'
+    return record_server_health(server, 'ok', version=version, latency_ms=round((time.monotonic() - started) * 1000))
+
+
+def prune_health_samples(server_id):
+    """Trim a server's samples to the newest HEALTH_SAMPLES_PER_SERVER."""
+    cutoff = (ServerHealthSample.query
+              .filter_by(server_id=server_id)
+              .order_by(ServerHealthSample.id.desc())
+              .with_entities(ServerHealthSample.id)
+              .offset(HEALTH_SAMPLES_PER_SERVER)
+              .limit(1)
+              .scalar())
+    if cutoff is not None:
+        ServerHealthSample.query.filter(
+            ServerHealthSample.server_id == server_id,
+            ServerHealthSample.id <= cutoff
+        ).delete(synchronize_session=False)
+
+
+def probe_servers(servers):
+    """Probe servers concurrently and append the results to their sample rings."""
+    workers = min(len(servers), PROBE_WORKERS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='favarr-probe') as pool:
+        # Each probe runs in a copy of this context so its calls count towards the request's timings
+        states = list(pool.map(lambda s: contextvars.copy_context().run(probe_server, s), servers))
     with app.app_context():
-        servers = Server.query.filter_by(enabled=True).all()
-        if not servers:
-            log_service('Integrations', 'No servers configured; skipping connectivity check')
-            return
+        for server, state in zip(servers, states):
+            db.session.add(ServerHealthSample(
+                server_id=server.id,
+                ok=state['status'] == 'ok',
+                latency_ms=state.get('latency_ms'),
+                error=state.get('error')
+            ))
+            prune_health_samples(server.id)
+        db.session.commit()
+    return states
+
+
+def enabled_server_snapshots():
+    with app.app_context():
+        return [server_snapshot(s) for s in Server.query.filter_by(enabled=True).all()]
+
+
+def check_integrations_on_startup():
+    """Check connectivity to all enabled servers concurrently, once per deployment start."""
+    if not get_response_cache().add('startup-checks', str(os.getpid()).encode(), STARTUP_CHECK_LEASE):
+        return
+    servers = enabled_server_snapshots()
+    if not servers:
+        log_service('Integrations', 'No servers configured; skipping connectivity check')
+        return
+
+    for server in servers:
+        record_server_health(server, 'pending')
+    states = probe_servers(servers)
+    for server, state in zip(servers, states):
+        if state['status'] == 'ok':
+            log_service('Integrations', f'Connected to "{server.name}" ({server.server_type}) - {state["version"]}')
+        else:
+            log_service(
+                'Integrations',
+                f'Failed to connect to "{server.name}" ({server.server_type}): {state["error"]}',
+                level='warning'
+            )
+    reachable = sum(state['status'] == 'ok' for state in states)
+    log_service('Integrations', f'Startup checks finished: {reachable}/{len(servers)} servers reachable')
 
-        for server in servers:
-            try:
-                info = get_server_info_internal(server)
-                version = info.get('Version') or info.get('ServerName') or 'unknown'
-                log_service(
-                    'Integrations',
-                    f'Connected to "{server.name}" ({server.server_type}) - {version}'
-                )
-            except Exception as e:
-                log_service(
-                    'Integrations',
-                    f'Failed to connect to "{server.name}" ({server.server_type}): {e}',
-                    level='warning'
-                )
 
+def run_health_monitor():
+    """Scheduled probe of every enabled server; one worker does it per interval."""
+    if not get_response_cache().add('health-probe', str(os.getpid()).encode(), HEALTH_PROBE_INTERVAL * 0.8):
+        return
+    servers = enabled_server_snapshots()
+    if servers:
+        probe_servers(servers)
 
-# Run an initial connectivity check when the app starts
-def read_log_lines(limit=200):
-    """Return the last N log lines from the app log file."""
-    if not os.path.exists(log_file):
-        return []
-    lines = deque(maxlen=limit)
-    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            lines.append(line.rstrip('\n'))
-    return list(lines)
+
+def read_log_lines(limit=200, log_filter=None, cursor=None):
+    """Return the last N matching log records across the app log and its backups."""
+    return tail_logs(log_files(log_file, LOG_BACKUP_COUNT), limit, log_filter, cursor)
 
 
 def get_server_or_404(server_id):
@@ -232,137 +520,212 @@ def health():
     return jsonify({'status': 'ok'})
 
 
+@app.route('/api/diagnostics/upstream', methods=['GET'])
+def upstream_diagnostics():
+    """Process-wide upstream cache, request coalescing and pool counters."""
+    return jsonify({
+        'pid': os.getpid(),
+        'cache': get_response_cache().stats(),
+        'coalescing': inflight_reads.stats(),
+        'pools': pool_registry.snapshot(),
+    })
+
+
+@app.route('/api/diagnostics/admission', methods=['GET'])
+def admission_diagnostics():
+    """This worker's admission classes: limits, in-flight, queued and rejected requests."""
+    return jsonify({'pid': os.getpid(), 'classes': admission_state()})
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics for every worker of this deployment."""
+    return Response(render_metrics(get_response_cache()), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    """Return tail of backend logs."""
+    """Return tail of backend logs, filtered by level, service, since/until and q; page back with cursor."""
     limit = int(request.args.get('limit', 200))
     try:
-        return jsonify({
-            'lines': read_log_lines(limit),
-            'limit': limit,
-            'path': os.path.basename(log_file)
-        })
+        log_filter = LogFilter.from_args(request.args)
+        result = read_log_lines(limit, log_filter, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'lines': result['lines'],
+        'cursor': result['cursor'],
+        'limit': limit,
+        'path': os.path.basename(log_file)
+    })
 
 
-@app.route('/api/stats', methods=['GET'])
-def get_stats():
-    """Get statistics across all servers."""
+@app.route('/api/logs/stream', methods=['GET'])
+def stream_logs():
+    """Server-sent events with new log records, filtered like /api/logs."""
     try:
-        servers = Server.query.filter_by(enabled=True).all()
-        stats = {
-            'servers': {
-                'total': len(servers),
-                'by_type': {}
-            },
-            'users': {
-                'total': 0,
-                'by_server': []
-            },
-            'favorites': {
-                'total': 0,
-                'by_server': [],
-                'by_type': {}
-            }
-        }
+        log_filter = LogFilter.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Count servers by type
-        for server in servers:
-            stype = server.server_type
-            stats['servers']['by_type'][stype] = stats['servers']['by_type'].get(stype, 0) + 1
-
-        # Gather user and favorites stats per server
-        for server in servers:
-            server_stats = {
-                'id': server.id,
-                'name': server.name,
-                'server_type': server.server_type,
-                'users': 0,
-                'favorites': 0
-            }
+    log_buffer.follow(log_file)
+    latest = log_buffer.latest()
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    if after is None:
+        seq = max(0, latest - LOG_STREAM_BACKLOG)
+    elif after.isdigit() and int(after) <= latest:
+        seq = int(after)
+    else:
+        seq = latest  # 'now', or an id from another worker's buffer
+    release = detach_admission()
+
+    def generate():
+        nonlocal seq
+        closes_at = time.monotonic() + LOG_STREAM_MAX_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < closes_at:
+                records = log_buffer.wait(seq, LOG_STREAM_KEEPALIVE)
+                if not records:
+                    yield ': keepalive\n\n'
+                    continue
+                for seq, text in records:
+                    record = parse_record(text)
+                    if log_filter.matches(record):
+                        yield f'id: {seq}\nevent: log\ndata: {json.dumps(record)}\n\n'
+        finally:
+            release()
 
-            try:
-                # Get users
-                if server.server_type == 'plex':
-                    info = server_request(server, '/accounts')
-                    accounts = info.get('MediaContainer', {}).get('Account', [])
-                    users = [{'Id': str(a.get('id')), 'Name': a.get('name', 'Unknown')} for a in accounts]
-                    if not users:
-                        users = [{'Id': '1', 'Name': 'Owner'}]
-                elif server.server_type == 'stremio':
-                    users = [{'Id': 'self', 'Name': 'Stremio'}]
-                elif server.server_type == 'audiobookshelf':
-                    users = normalize_abs_users(server_request(server, '/api/users'))
-                    users = [{'Id': u.get('id'), 'Name': u.get('username', 'Unknown')} for u in users]
-                else:
-                    users = server_request(server, '/Users')
-                    users = [{'Id': u.get('Id'), 'Name': u.get('Name', 'Unknown')} for u in users]
-
-                server_stats['users'] = len(users)
-                stats['users']['total'] += len(users)
-
-                # Get favorites count for ALL users on this server
-                server_fav_count = 0
-                for user in users:
-                    user_id = user.get('Id')
-                    try:
-                        if server.server_type == 'plex':
-                            # Plex ratings are per-account, query with user context
-                            result = server_request(server, '/library/all', params={'userRating>>': '7'})
-                            metadata = result.get('MediaContainer', {}).get('Metadata', [])
-                            fav_count = len(metadata)
-                        elif server.server_type == 'stremio':
-                            fav_items = stremio_library_items(server)
-                            fav_count = len(fav_items)
-                            for item in fav_items:
-                                item_type = (item.get('type') or 'Other').title()
-                                stats['favorites']['by_type'][item_type] = stats['favorites']['by_type'].get(item_type, 0) + 1
-                        elif server.server_type == 'audiobookshelf':
-                            # ABS: look for user's named favorites collection
-                            user_name = user.get('Name')
-                            collections = normalize_abs_collections(server_request(server, '/api/collections'))
-                            fav_count = 0
-                            for collection in collections:
-                                name = (collection.get('name') or '').lower()
-                                if user_name and user_name.lower() in name and ('favorite' in name or 'favourite' in name):
-                                    item_ids, _ = abs_collection_item_ids(collection)
-                                    fav_count += len(item_ids)
-                                    break
-                        else:
-                            # Emby/Jellyfin: query user's favorites
-                            params = {'Filters': 'IsFavorite', 'Recursive': 'true'}
-                            favorites = server_request(server, f'/Users/{user_id}/Items', params=params)
-                            items = favorites.get('Items', [])
-                            fav_count = len(items)
-
-                            # Count by type
-                            for item in items:
-                                item_type = item.get('Type', 'Other')
-                                stats['favorites']['by_type'][item_type] = stats['favorites']['by_type'].get(item_type, 0) + 1
-
-                        server_fav_count += fav_count
-                    except Exception:
-                        continue
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+async def fetch_server_users_async(server):
+    """List a server's users in the shared {'Id', 'Name'} shape."""
+    if server.server_type == 'plex':
+        info = await async_server_request(server, '/accounts')
+        accounts = info.get('MediaContainer', {}).get('Account', [])
+        users = [{'Id': str(a.get('id')), 'Name': a.get('name', 'Unknown')} for a in accounts]
+        return users or [{'Id': '1', 'Name': 'Owner'}]
+    if server.server_type == 'stremio':
+        return [{'Id': 'self', 'Name': 'Stremio'}]
+    if server.server_type == 'audiobookshelf':
+        users = normalize_abs_users(await async_server_request(server, '/api/users'))
+        return [{'Id': u.get('id'), 'Name': u.get('username', 'Unknown')} for u in users]
+    users = await async_server_request(server, '/Users')
+    return [{'Id': u.get('Id'), 'Name': u.get('Name', 'Unknown')} for u in users]
+
+
+async def count_user_favorites_async(server, user, by_type):
+    """Count one user's favourites, tallying item types into by_type."""
+    user_id = user.get('Id')
+    if server.server_type == 'plex':
+        # Plex ratings are per-account, query with user context
+        result = await async_server_request(server, '/library/all', params={'userRating>>': '7'})
+        return len(result.get('MediaContainer', {}).get('Metadata', []))
+    if server.server_type == 'stremio':
+        fav_items = await asyncio.to_thread(stremio_library_items, server)
+        for item in fav_items:
+            item_type = (item.get('type') or 'Other').title()
+            by_type[item_type] = by_type.get(item_type, 0) + 1
+        return len(fav_items)
+    if server.server_type == 'audiobookshelf':
+        # ABS: look for user's named favorites collection
+        user_name = user.get('Name')
+        collections = normalize_abs_collections(await async_server_request(server, '/api/collections'))
+        for collection in collections:
+            name = (collection.get('name') or '').lower()
+            if user_name and user_name.lower() in name and ('favorite' in name or 'favourite' in name):
+                item_ids, _ = abs_collection_item_ids(collection)
+                return len(item_ids)
+        return 0
+    # Emby/Jellyfin: query user's favorites
+    params = {'Filters': 'IsFavorite', 'Recursive': 'true'}
+    favorites = await async_server_request(server, f'/Users/{user_id}/Items', params=params)
+    items = favorites.get('Items', [])
+    for item in items:
+        item_type = item.get('Type', 'Other')
+        by_type[item_type] = by_type.get(item_type, 0) + 1
+    return len(items)
+
+
+async def collect_server_stats_async(server):
+    """Users and favourites for one server, with every user's favourites fetched concurrently."""
+    result = {'users': 0, 'favorites': 0, 'by_type': {}, 'error': None}
+    try:
+        users = await fetch_server_users_async(server)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    result['users'] = len(users)
+    counts = await asyncio.gather(
+        *(count_user_favorites_async(server, user, result['by_type']) for user in users),
+        return_exceptions=True
+    )
+    result['favorites'] = sum(c for c in counts if isinstance(c, int))
+    result['skipped_users'] = [
+        user.get('Name') for user, count in zip(users, counts) if isinstance(count, DeadlineExceeded)
+    ]
+    return result
+
+
+def merge_server_stats(stats, server, server_result):
+    """Fold one server's collected numbers into the aggregate stats payload."""
+    stats['users']['total'] += server_result['users']
+    stats['favorites']['total'] += server_result['favorites']
+    for item_type, count in server_result['by_type'].items():
+        stats['favorites']['by_type'][item_type] = stats['favorites']['by_type'].get(item_type, 0) + count
+    marker = {}
+    if server_result.get('partial') or server_result.get('skipped_users'):
+        marker['partial'] = True
+    if server_result.get('error'):
+        marker['error'] = server_result['error']
+    stats['users']['by_server'].append({'id': server.id, 'name': server.name, 'count': server_result['users'], **marker})
+    stats['favorites']['by_server'].append(
+        {'id': server.id, 'name': server.name, 'count': server_result['favorites'], **marker}
+    )
 
-                server_stats['favorites'] = server_fav_count
-                stats['favorites']['total'] += server_fav_count
 
-            except Exception as e:
-                server_stats['error'] = str(e)
+def empty_stats(servers):
+    stats = {
+        'servers': {'total': len(servers), 'by_type': {}},
+        'users': {'total': 0, 'by_server': []},
+        'favorites': {'total': 0, 'by_server': [], 'by_type': {}}
+    }
+    for server in servers:
+        stype = server.server_type
+        stats['servers']['by_type'][stype] = stats['servers']['by_type'].get(stype, 0) + 1
+    return stats
 
-            stats['users']['by_server'].append({
-                'id': server.id,
-                'name': server.name,
-                'count': server_stats['users']
-            })
-            stats['favorites']['by_server'].append({
-                'id': server.id,
-                'name': server.name,
-                'count': server_stats['favorites']
-            })
 
-        return jsonify(stats)
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get statistics across all servers."""
+    try:
+        servers = [server_snapshot(s) for s in Server.query.filter_by(enabled=True).all()]
+        stats = empty_stats(servers)
+        results = gather_async(collect_server_stats_async(server) for server in servers)
+        skipped = []
+        for server, server_result in zip(servers, results):
+            if isinstance(server_result, DeadlineExceeded):
+                skipped.append({'server_id': server.id, 'name': server.name, 'reason': 'deadline'})
+                server_result = {'users': 0, 'favorites': 0, 'by_type': {}, 'partial': True,
+                                 'error': 'Not collected before the request deadline'}
+            elif isinstance(server_result, Exception):
+                server_result = {'users': 0, 'favorites': 0, 'by_type': {}, 'error': str(server_result)}
+            if server_result.get('skipped_users'):
+                skipped.append({
+                    'server_id': server.id, 'name': server.name, 'reason': 'deadline',
+                    'users': server_result['skipped_users']
+                })
+            merge_server_stats(stats, server, server_result)
+        return jsonify({**stats, **partial_result(skipped)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -395,7 +758,6 @@ def get_quick_stats():
 
 def collect_stats_task(snapshot_id):
     """Background task to collect statistics and update snapshot."""
-    import time
     start_time = time.time()
 
     with app.app_context():
@@ -409,92 +771,27 @@ def collect_stats_task(snapshot_id):
             snapshot.collection_message = 'Starting collection...'
             db.session.commit()
 
-            servers = Server.query.filter_by(enabled=True).all()
+            servers = [server_snapshot(s) for s in Server.query.filter_by(enabled=True).all()]
             total_steps = len(servers) + 1  # +1 for final processing
+            stats = empty_stats(servers)
 
-            stats = {
-                'servers': {'total': len(servers), 'by_type': {}},
-                'users': {'total': 0, 'by_server': []},
-                'favorites': {'total': 0, 'by_server': [], 'by_type': {}}
-            }
-
-            # Count servers by type
-            for server in servers:
-                stype = server.server_type
-                stats['servers']['by_type'][stype] = stats['servers']['by_type'].get(stype, 0) + 1
-
-            # Process each server
-            for idx, server in enumerate(servers):
-                snapshot.collection_message = f'Processing {server.name}...'
-                snapshot.collection_progress = int((idx / total_steps) * 100)
-                db.session.commit()
-
-                server_users = 0
-                server_fav_count = 0
-
+            # Servers are collected concurrently; progress advances as each finishes
+            futures = {submit_async(collect_server_stats_async(server)): server for server in servers}
+            results = {}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                server = futures[future]
                 try:
-                    # Get users
-                    if server.server_type == 'plex':
-                        info = server_request(server, '/accounts')
-                        accounts = info.get('MediaContainer', {}).get('Account', [])
-                        users = [{'Id': str(a.get('id')), 'Name': a.get('name', 'Unknown')} for a in accounts]
-                        if not users:
-                            users = [{'Id': '1', 'Name': 'Owner'}]
-                    elif server.server_type == 'stremio':
-                        users = [{'Id': 'self', 'Name': 'Stremio'}]
-                    elif server.server_type == 'audiobookshelf':
-                        users = normalize_abs_users(server_request(server, '/api/users'))
-                        users = [{'Id': u.get('id'), 'Name': u.get('username', 'Unknown')} for u in users]
-                    else:
-                        users = server_request(server, '/Users')
-                        users = [{'Id': u.get('Id'), 'Name': u.get('Name', 'Unknown')} for u in users]
-
-                    server_users = len(users)
-                    stats['users']['total'] += server_users
-
-                    # Get favorites for all users
-                    for user in users:
-                        user_id = user.get('Id')
-                        try:
-                            if server.server_type == 'plex':
-                                result = server_request(server, '/library/all', params={'userRating>>': '7'})
-                                metadata = result.get('MediaContainer', {}).get('Metadata', [])
-                                fav_count = len(metadata)
-                            elif server.server_type == 'stremio':
-                                fav_items = stremio_library_items(server)
-                                fav_count = len(fav_items)
-                                for item in fav_items:
-                                    item_type = (item.get('type') or 'Other').title()
-                                    stats['favorites']['by_type'][item_type] = stats['favorites']['by_type'].get(item_type, 0) + 1
-                            elif server.server_type == 'audiobookshelf':
-                                user_name = user.get('Name')
-                                collections = normalize_abs_collections(server_request(server, '/api/collections'))
-                                fav_count = 0
-                                for collection in collections:
-                                    name = (collection.get('name') or '').lower()
-                                    if user_name and user_name.lower() in name and ('favorite' in name or 'favourite' in name):
-                                        item_ids, _ = abs_collection_item_ids(collection)
-                                        fav_count += len(item_ids)
-                                        break
-                            else:
-                                params = {'Filters': 'IsFavorite', 'Recursive': 'true'}
-                                favorites = server_request(server, f'/Users/{user_id}/Items', params=params)
-                                items = favorites.get('Items', [])
-                                fav_count = len(items)
-                                for item in items:
-                                    item_type = item.get('Type', 'Other')
-                                    stats['favorites']['by_type'][item_type] = stats['favorites']['by_type'].get(item_type, 0) + 1
-
-                            server_fav_count += fav_count
-                        except Exception:
-                            continue
-
+                    results[server.id] = future.result()
                 except Exception as e:
-                    app.logger.warning(f'Stats collection error for {server.name}: {e}')
+                    results[server.id] = {'users': 0, 'favorites': 0, 'by_type': {}, 'error': str(e)}
+                if results[server.id]['error']:
+                    app.logger.warning(f'Stats collection error for {server.name}: {results[server.id]["error"]}')
+                snapshot.collection_message = f'Processed {server.name} ({done}/{len(servers)})'
+                snapshot.collection_progress = int((done / total_steps) * 100)
+                db.session.commit()
 
-                stats['users']['by_server'].append({'id': server.id, 'name': server.name, 'count': server_users})
-                stats['favorites']['by_server'].append({'id': server.id, 'name': server.name, 'count': server_fav_count})
-                stats['favorites']['total'] += server_fav_count
+            for server in servers:
+                merge_server_stats(stats, server, results[server.id])
 
             # Save final stats
             snapshot.collection_message = 'Saving results...'
@@ -515,6 +812,7 @@ def collect_stats_task(snapshot_id):
             db.session.commit()
 
             app.logger.info(f'Stats collection completed in {snapshot.duration_seconds:.1f}s')
+            observe_job('stats-collection', snapshot.duration_seconds)
 
         except Exception as e:
             snapshot.collection_status = 'failed'
@@ -522,22 +820,24 @@ def collect_stats_task(snapshot_id):
             snapshot.duration_seconds = time.time() - start_time
             db.session.commit()
             app.logger.error(f'Stats collection failed: {e}')
+            observe_job('stats-collection', snapshot.duration_seconds, ok=False)
 
         finally:
-            _stats_collection_task['running'] = False
-            _stats_collection_task['snapshot_id'] = None
+            get_response_cache().delete(STATS_COLLECTION_KEY)
 
 
 @app.route('/api/stats/collect', methods=['POST'])
 def start_stats_collection():
     """Start a new statistics collection task."""
-    if _stats_collection_task['running']:
-        snapshot = StatsSnapshot.query.get(_stats_collection_task['snapshot_id'])
-        if snapshot:
-            return jsonify({
-                'message': 'Collection already in progress',
-                'snapshot': snapshot.to_dict()
-            }), 409
+    cache = get_response_cache()
+    # Claim the collection slot before creating a snapshot; only one worker can win
+    if not cache.add(STATS_COLLECTION_KEY, b'0', STATS_COLLECTION_LEASE):
+        snapshot_id = running_collection_id()
+        snapshot = StatsSnapshot.query.get(snapshot_id) if snapshot_id else None
+        return jsonify({
+            'message': 'Collection already in progress',
+            'snapshot': snapshot.to_dict() if snapshot else None
+        }), 409
 
     # Create new snapshot
     snapshot = StatsSnapshot(
@@ -547,9 +847,7 @@ def start_stats_collection():
     )
     db.session.add(snapshot)
     db.session.commit()
-
-    _stats_collection_task['running'] = True
-    _stats_collection_task['snapshot_id'] = snapshot.id
+    cache.set(STATS_COLLECTION_KEY, str(snapshot.id).encode(), STATS_COLLECTION_LEASE)
 
     # Start background thread
     import threading
@@ -566,8 +864,9 @@ def start_stats_collection():
 @app.route('/api/stats/collect/status', methods=['GET'])
 def get_collection_status():
     """Get the status of the current or most recent collection."""
-    if _stats_collection_task['running'] and _stats_collection_task['snapshot_id']:
-        snapshot = StatsSnapshot.query.get(_stats_collection_task['snapshot_id'])
+    snapshot_id = running_collection_id()
+    if snapshot_id:
+        snapshot = StatsSnapshot.query.get(snapshot_id)
         if snapshot:
             return jsonify({'running': True, 'snapshot': snapshot.to_dict()})
 
@@ -613,7 +912,78 @@ def delete_snapshot(snapshot_id):
 def list_servers():
     """List all configured servers."""
     servers = Server.query.all()
-    return jsonify([s.to_dict() for s in servers])
+    return jsonify([
+        {
+            **s.to_dict(),
+            'breaker': circuit_breaker_state(s),
+            'limiter': server_limiter_state(s),
+            'pool': server_pool_state(s),
+            'latency': upstream_latency_state(s),
+            'health': server_health_state(s),
+        }
+        for s in servers
+    ])
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list, or None when empty."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@app.route('/api/servers/health', methods=['GET'])
+def servers_health():
+    """Reachability and latency per server from the background monitor (no live probes)."""
+    result = []
+    for server in Server.query.order_by(Server.id).all():
+        samples = (ServerHealthSample.query
+                   .filter_by(server_id=server.id)
+                   .order_by(ServerHealthSample.id.desc())
+                   .limit(HEALTH_SAMPLES_PER_SERVER)
+                   .all())
+        latencies = sorted(s.latency_ms for s in samples if s.ok and s.latency_ms is not None)
+        ok_count = sum(1 for s in samples if s.ok)
+        last_ok = next((s for s in samples if s.ok), None)
+        last_failure = next((s for s in samples if not s.ok), None)
+        result.append({
+            'id': server.id,
+            'name': server.name,
+            'server_type': server.server_type,
+            'enabled': server.enabled,
+            'state': server_health_state(server),
+            'samples': len(samples),
+            'uptime': round(ok_count / len(samples), 4) if samples else None,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'last_ok_at': last_ok.created_at.isoformat() if last_ok and last_ok.created_at else None,
+            'last_failure': last_failure.to_dict() if last_failure else None,
+            'breaker': circuit_breaker_state(server),
+        })
+    return jsonify({'interval_seconds': HEALTH_PROBE_INTERVAL, 'servers': result})
+
+
+SERVER_LIMIT_FIELDS = {
+    'max_concurrency': int,
+    'rate_limit': float,
+    'rate_burst': int,
+}
+
+
+def apply_server_limits(server, data):
+    """Copy outbound limit fields from request data; blank or null resets to default."""
+    for field, cast in SERVER_LIMIT_FIELDS.items():
+        if field not in data:
+            continue
+        value = data[field]
+        if value in (None, ''):
+            setattr(server, field, None)
+            continue
+        value = cast(value)
+        if value < 0 or (value == 0 and field != 'rate_limit'):
+            raise ValueError(f'{field} must be positive')
+        setattr(server, field, value)
 
 
 @app.route('/api/servers', methods=['POST'])
@@ -629,6 +999,10 @@ def create_server():
         token=data.get('token'),
         enabled=data.get('enabled', True)
     )
+    try:
+        apply_server_limits(server, data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
 
     db.session.add(server)
     db.session.commit()
@@ -667,8 +1041,14 @@ def update_server(server_id):
         server.token = data['token']
     if 'enabled' in data:
         server.enabled = data['enabled']
+    try:
+        apply_server_limits(server, data)
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
 
     db.session.commit()
+    reset_server_state(server)
     log_service('Server', f'Updated server "{server.name}" (id={server_id})')
     return jsonify(server.to_dict())
 
@@ -681,6 +1061,8 @@ def delete_server(server_id):
         return jsonify({'error': 'Server not found'}), 404
 
     server_name = server.name
+    reset_server_state(server)
+    ServerHealthSample.query.filter_by(server_id=server_id).delete()
     db.session.delete(server)
     db.session.commit()
     log_service('Server', f'Deleted server "{server_name}" (id={server_id})')
@@ -696,28 +1078,36 @@ def test_server(server_id):
 
     log_service('Server', f'Testing connection to "{server.name}" ({server.server_type})')
 
+    # An explicit test always goes to the network, even if the breaker is open.
+    reset_circuit_breaker(server)
+    started = time.monotonic()
     try:
-        info = get_server_info_internal(server)
+        info = get_server_info_internal(server, use_cache=False)
+        record_server_health(
+            server, 'ok', version=info.get('Version') or info.get('ServerName'),
+            latency_ms=round((time.monotonic() - started) * 1000)
+        )
         log_service('Server', f'Connection test passed for "{server.name}"')
         return jsonify({'success': True, 'info': info})
     except Exception as e:
+        record_server_health(server, 'error', error=str(e))
         log_service('Server', f'Connection test failed for "{server.name}": {e}', level='warning')
         return jsonify({'success': False, 'error': str(e)}), 400
 
 
 # ============ Server Info ============
 
-def get_server_info_internal(server):
-    """Internal function to get server info."""
+def get_server_info_internal(server, use_cache=True):
+    """Internal function to get server info; use_cache=False forces a live round-trip."""
     if server.server_type == 'plex':
-        info = server_request(server, '/')
+        info = server_request(server, '/', use_cache=use_cache)
         return {
             'ServerName': info.get('MediaContainer', {}).get('friendlyName', 'Plex Server'),
             'Version': info.get('MediaContainer', {}).get('version', ''),
             'ServerType': 'plex'
         }
     elif server.server_type == 'stremio':
-        info = stremio_request(server, 'addonCollectionGet', {'update': False})
+        info = stremio_request(server, 'addonCollectionGet', {'update': False}, use_cache=use_cache)
         addons = info.get('addons', info.get('result', [])) or []
         return {
             'ServerName': 'Stremio',
@@ -726,7 +1116,7 @@ def get_server_info_internal(server):
         }
     elif server.server_type == 'audiobookshelf':
         # Use /api/libraries to verify API key works (authenticated endpoint)
-        libs = server_request(server, '/api/libraries')
+        libs = server_request(server, '/api/libraries', use_cache=use_cache)
         lib_count = len(libs.get('libraries', []))
         return {
             'ServerName': 'Audiobookshelf',
@@ -734,7 +1124,7 @@ def get_server_info_internal(server):
             'ServerType': 'audiobookshelf'
         }
     else:  # emby or jellyfin
-        info = server_request(server, '/System/Info')
+        info = server_request(server, '/System/Info', use_cache=use_cache)
         return {
             'ServerName': info.get('ServerName', server.server_type.title()),
             'Version': info.get('Version', ''),
@@ -756,10 +1146,6 @@ def get_server_info(server_id):
         return jsonify({'error': str(e)}), 500
 
 
-# Run an initial connectivity check when the app starts (after helpers are defined)
-check_integrations_on_startup()
-
-
 # ============ Users ============
 
 @app.route('/api/servers/<int:server_id>/users', methods=['GET'])
@@ -801,6 +1187,33 @@ def _ensure_emby_layout_server(server):
     return None
 
 
+def _layout_client_args(data):
+    """Client and device id for display preferences, from the query string or JSON body."""
+    client = (
+        request.args.get('client')
+        or request.args.get('Client')
+        or data.get('client')
+        or data.get('Client')
+    )
+    device_id = (
+        request.args.get('deviceId')
+        or request.args.get('device_id')
+        or request.args.get('DeviceId')
+        or request.args.get('DeviceID')
+        or data.get('deviceId')
+        or data.get('device_id')
+        or data.get('DeviceId')
+        or data.get('DeviceID')
+    )
+    return client, device_id
+
+
+def _dry_run_requested(data):
+    """True when ?dry_run=1 (or true/yes) or a truthy dry_run in the JSON body."""
+    flag = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    return flag or bool(data.get('dry_run'))
+
+
 @app.route('/api/emby/<int:server_id>/layouts/users', methods=['GET'])
 def emby_layout_users(server_id):
     """Get Emby users for layout management."""
@@ -850,22 +1263,7 @@ def emby_apply_layout(server_id, user_id):
     if template is None:
         template = data
 
-    client = (
-        request.args.get('client')
-        or request.args.get('Client')
-        or data.get('client')
-        or data.get('Client')
-    )
-    device_id = (
-        request.args.get('deviceId')
-        or request.args.get('device_id')
-        or request.args.get('DeviceId')
-        or request.args.get('DeviceID')
-        or data.get('deviceId')
-        or data.get('device_id')
-        or data.get('DeviceId')
-        or data.get('DeviceID')
-    )
+    client, device_id = _layout_client_args(data)
 
     if isinstance(template, str):
         try:
@@ -874,7 +1272,9 @@ def emby_apply_layout(server_id, user_id):
             return jsonify({'error': 'Template JSON is invalid'}), 400
 
     try:
-        result = emby_apply_layout_template(server, user_id, template, client=client, device_id=device_id)
+        result = emby_apply_layout_template(
+            server, user_id, template, client=client, device_id=device_id, dry_run=_dry_run_requested(data)
+        )
         return jsonify(result)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -882,6 +1282,425 @@ def emby_apply_layout(server_id, user_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _select_layout_users(users, requested):
+    """({user_id: name} for the requested ids or 'all', [unknown ids])."""
+    names = {str(u.get('Id')): u.get('Name') or str(u.get('Id')) for u in users if u.get('Id')}
+    if requested == 'all':
+        return names, []
+    unknown = [str(u) for u in requested if str(u) not in names]
+    return {str(u): names[str(u)] for u in requested if str(u) in names}, unknown
+
+
+def bulk_apply_layout_task(operation_id, server, user_names, template, client, device_id, dry_run=False):
+    """Background task applying a layout template to many users and recording progress."""
+    start_time = time.time()
+
+    with app.app_context():
+        operation = BulkOperation.query.get(operation_id)
+        if not operation:
+            return
+
+        try:
+            operation.status = 'running'
+            operation.message = f'Applying layout to {len(user_names)} users...'
+            db.session.commit()
+
+            futures = emby_submit_bulk_apply(
+                server, list(user_names), template, client=client, device_id=device_id, dry_run=dry_run
+            )
+            results = []
+            writes = 0
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                user_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'applied': [], 'errors': [{'id': None, 'error': str(e)}], 'total': len(template)}
+                result = {'user_id': user_id, 'name': user_names[user_id], **result}
+                results.append(result)
+                writes += len(result.get('changed', []))
+                if result['errors']:
+                    operation.failed += 1
+                else:
+                    operation.succeeded += 1
+                operation.progress = int((done / len(futures)) * 100)
+                operation.message = f'Applied to {user_names[user_id]} ({done}/{len(futures)})'
+                operation.results = json.dumps(results)
+                db.session.commit()
+
+            operation.status = 'completed'
+            operation.progress = 100
+            operation.message = (
+                f'{operation.succeeded} succeeded, {operation.failed} failed, '
+                f'{writes} preference{"s" if writes != 1 else ""} {"to write" if dry_run else "written"}'
+            )
+            operation.duration_seconds = time.time() - start_time
+            db.session.commit()
+            app.logger.info(f'Bulk layout apply on {server.name}: {operation.message} in {operation.duration_seconds:.1f}s')
+            observe_job('layout-apply', operation.duration_seconds)
+
+        except Exception as e:
+            operation.status = 'failed'
+            operation.message = str(e)
+            operation.duration_seconds = time.time() - start_time
+            db.session.commit()
+            app.logger.error(f'Bulk layout apply failed: {e}')
+            observe_job('layout-apply', operation.duration_seconds, ok=False)
+
+
+@app.route('/api/emby/<int:server_id>/layouts/bulk-apply', methods=['POST'])
+def emby_bulk_apply_layout(server_id):
+    """Apply a layout template to many Emby users as a background operation."""
+    server = get_server_or_404(server_id)
+    error = _ensure_emby_layout_server(server)
+    if error:
+        return error
+
+    data = request.get_json() or {}
+    template_id = data.get('template_id')
+    if template_id is not None:
+        saved = EmbyLayoutTemplate.query.get(template_id)
+        if not saved:
+            return jsonify({'error': 'Template not found'}), 404
+        template = saved.payload()
+    else:
+        template = data.get('template') or data.get('layout') or data.get('json_blob')
+        if template is None:
+            return jsonify({'error': 'template_id or template is required'}), 400
+        if isinstance(template, str):
+            try:
+                template = json.loads(template)
+            except json.JSONDecodeError:
+                return jsonify({'error': 'Template JSON is invalid'}), 400
+
+    requested = data.get('users') or data.get('user_ids')
+    if requested != 'all' and (not isinstance(requested, list) or not requested):
+        return jsonify({'error': 'users must be a list of user IDs or "all"'}), 400
+
+    client, device_id = _layout_client_args(data)
+    dry_run = _dry_run_requested(data)
+    try:
+        emby_validate_layout_template(server, template)
+        users = emby_layout_get_users(server)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    user_names, unknown = _select_layout_users(users, requested)
+    if unknown:
+        return jsonify({'error': f"Unknown user IDs: {', '.join(unknown)}"}), 400
+
+    operation = BulkOperation(
+        kind='layout_apply',
+        server_id=server.id,
+        status='pending',
+        message='Queued',
+        total=len(user_names),
+        params=json.dumps({
+            'template_id': template_id,
+            'users': list(user_names),
+            'client': client,
+            'device_id': device_id,
+            'dry_run': dry_run,
+        }),
+    )
+    db.session.add(operation)
+    db.session.commit()
+
+    import threading
+    thread = threading.Thread(
+        target=bulk_apply_layout_task,
+        args=(operation.id, server_snapshot(server), user_names, template, client, device_id, dry_run),
+    )
+    thread.daemon = True
+    thread.start()
+
+    return jsonify({
+        'message': 'Bulk apply started',
+        'operation': operation.to_dict(include_results=False)
+    }), 202
+
+
+def bulk_capture_layout_task(operation_id, server, user_names, client, device_id, name):
+    """Background task saving users' current layouts as templates, one per distinct layout."""
+    start_time = time.time()
+
+    with app.app_context():
+        operation = BulkOperation.query.get(operation_id)
+        if not operation:
+            return
+
+        try:
+            operation.status = 'running'
+            operation.message = f'Capturing layouts of {len(user_names)} users...'
+            db.session.commit()
+
+            futures = emby_submit_bulk_capture(server, list(user_names), client=client, device_id=device_id)
+            results = []
+            created = 0
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                user_id = futures[future]
+                result = {'user_id': user_id, 'name': user_names[user_id]}
+                try:
+                    captured = future.result()
+                    layouts = captured['layouts']
+                    content_hash = LayoutBlob.hash_payload(layouts)
+                    template = EmbyLayoutTemplate.query.filter_by(content_hash=content_hash).first()
+                    if not template:
+                        template = EmbyLayoutTemplate(
+                            name=f'{name} ({user_names[user_id]})',
+                            description=f'Captured from {user_names[user_id]} on {server.name}',
+                            content_hash=LayoutBlob.store(layouts).content_hash,
+                        )
+                        db.session.add(template)
+                        db.session.flush()
+                        created += 1
+                    result.update({
+                        'template_id': template.id,
+                        'content_hash': content_hash,
+                        'prefs': list(layouts),
+                        'unsupported': captured['unsupported'],
+                    })
+                    operation.succeeded += 1
+                except Exception as e:
+                    result['error'] = str(e)
+                    operation.failed += 1
+                results.append(result)
+                operation.progress = int((done / len(futures)) * 100)
+                operation.message = f'Captured {user_names[user_id]} ({done}/{len(futures)})'
+                operation.results = json.dumps(results)
+                db.session.commit()
+
+            distinct = len({r['content_hash'] for r in results if 'content_hash' in r})
+            operation.status = 'completed'
+            operation.progress = 100
+            operation.message = (
+                f'{operation.succeeded} captured, {operation.failed} failed, '
+                f'{distinct} distinct layout{"s" if distinct != 1 else ""} ({created} new)'
+            )
+            operation.duration_seconds = time.time() - start_time
+            db.session.commit()
+            app.logger.info(f'Layout capture on {server.name}: {operation.message} in {operation.duration_seconds:.1f}s')
+            observe_job('layout-capture', operation.duration_seconds)
+
+        except Exception as e:
+            db.session.rollback()
+            operation.status = 'failed'
+            operation.message = str(e)
+            operation.duration_seconds = time.time() - start_time
+            db.session.commit()
+            app.logger.error(f'Layout capture failed: {e}')
+            observe_job('layout-capture', operation.duration_seconds, ok=False)
+
+
+@app.route('/api/emby/<int:server_id>/layouts/capture', methods=['POST'])
+def emby_bulk_capture_layouts(server_id):
+    """Save the current layouts of many Emby users as templates, deduplicated by content."""
+    server = get_server_or_404(server_id)
+    error = _ensure_emby_layout_server(server)
+    if error:
+        return error
+
+    data = request.get_json() or {}
+    requested = data.get('users', data.get('user_ids', 'all'))
+    if requested != 'all' and (not isinstance(requested, list) or not requested):
+        return jsonify({'error': 'users must be a list of user IDs or "all"'}), 400
+
+    client, device_id = _layout_client_args(data)
+    name = (data.get('name') or '').strip() or f'{server.name} layout'
+    try:
+        users = emby_layout_get_users(server)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    user_names, unknown = _select_layout_users(users, requested)
+    if unknown:
+        return jsonify({'error': f"Unknown user IDs: {', '.join(unknown)}"}), 400
+
+    operation = BulkOperation(
+        kind='layout_capture',
+        server_id=server.id,
+        status='pending',
+        message='Queued',
+        total=len(user_names),
+        params=json.dumps({'users': list(user_names), 'client': client, 'device_id': device_id, 'name': name}),
+    )
+    db.session.add(operation)
+    db.session.commit()
+
+    import threading
+    thread = threading.Thread(
+        target=bulk_capture_layout_task,
+        args=(operation.id, server_snapshot(server), user_names, client, device_id, name),
+    )
+    thread.daemon = True
+    thread.start()
+
+    return jsonify({
+        'message': 'Layout capture started',
+        'operation': operation.to_dict(include_results=False)
+    }), 202
+
+
+@app.route('/api/operations', methods=['GET'])
+def list_operations():
+    """List recent bulk operations, newest first."""
+    limit = int(request.args.get('limit', 30))
+    operations = BulkOperation.query.order_by(BulkOperation.id.desc()).limit(limit).all()
+    return jsonify([o.to_dict(include_results=False) for o in operations])
+
+
+@app.route('/api/operations/<int:operation_id>', methods=['GET'])
+def get_operation(operation_id):
+    """Progress and per-user results of one bulk operation."""
+    operation = BulkOperation.query.get(operation_id)
+    if not operation:
+        return jsonify({'error': 'Operation not found'}), 404
+    return jsonify(operation.to_dict())
+
+
+@app.route('/api/diagnostics/slow', methods=['GET'])
+def list_slow_requests():
+    """Recent requests over the slow threshold, newest first; filter by route and min_ms."""
+    limit = int(request.args.get('limit', 50))
+    query = SlowRequest.query
+    if request.args.get('route'):
+        query = query.filter(SlowRequest.route == request.args['route'])
+    if request.args.get('min_ms'):
+        query = query.filter(SlowRequest.duration_ms >= float(request.args['min_ms']))
+    include_calls = request.args.get('calls', '1').lower() not in ('0', 'false', 'no')
+    slow = query.order_by(SlowRequest.id.desc()).limit(limit).all()
+    return jsonify({
+        'threshold_ms': SLOW_REQUEST_SECONDS * 1000,
+        'requests': [r.to_dict(include_calls=include_calls) for r in slow]
+    })
+
+
+@app.route('/api/diagnostics/slow/<int:request_id>', methods=['GET'])
+def get_slow_request(request_id):
+    """One slow request with its upstream call trace."""
+    slow = SlowRequest.query.get(request_id)
+    if not slow:
+        return jsonify({'error': 'Slow request not found'}), 404
+    return jsonify(slow.to_dict())
+
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def get_profiling():
+    """Armed routes and the profile dumps on disk."""
+    return jsonify({'armed': armed_routes(), 'modes': list(PROFILE_MODES), 'profiles': list_profiles()})
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def arm_profiling():
+    """Profile the next N requests to a route rule, e.g. /api/servers/<int:server_id>/items."""
+    data = request.get_json() or {}
+    route = (data.get('route') or '').strip()
+    if route not in {rule.rule for rule in app.url_map.iter_rules()}:
+        return jsonify({'error': f'Unknown route: {route}'}), 400
+    try:
+        count = int(data.get('count', 1))
+        armed = arm_profiler(route, count, data.get('mode', 'cprofile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    log_service('System', f"Profiling the next {armed['count']} request(s) to {route} ({armed['mode']})")
+    return jsonify({**armed, 'max_count': MAX_ARMED_REQUESTS}), 201
+
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+@admin_required
+def disarm_profiling():
+    """Stop profiling one route (?route=) or all of them."""
+    disarm_profiler(request.args.get('route') or None)
+    return jsonify({'armed': armed_routes()})
+
+
+@app.route('/api/admin/profiles/<path:name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """Download a .prof or .folded dump."""
+    if not name.endswith(('.prof', '.folded')):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(profile_directory(), name, as_attachment=True)
+
+
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def get_memory():
+    """This worker's tracing state, cache and pool sizes, and the snapshots on disk."""
+    sizes = memory.sizes()
+    sizes['log_buffer'] = len(log_buffer.records)
+    return jsonify({**memory.status(), 'sizes': sizes, 'snapshots': memory.list_snapshots()})
+
+
+@app.route('/api/admin/memory/start', methods=['POST'])
+@admin_required
+def start_memory_tracing():
+    """Start tracemalloc in every worker; frames sets the traceback depth kept."""
+    data = request.get_json(silent=True) or {}
+    state = memory.start(int(data.get('frames', memory.DEFAULT_FRAMES)))
+    log_service('System', f"tracemalloc started ({state['frames']} frame(s))")
+    return jsonify(state)
+
+
+@app.route('/api/admin/memory/stop', methods=['POST'])
+@admin_required
+def stop_memory_tracing():
+    state = memory.stop()
+    log_service('System', 'tracemalloc stopped')
+    return jsonify(state)
+
+
+@app.route('/api/admin/memory/snapshot', methods=['POST'])
+@admin_required
+def take_memory_snapshot():
+    """Dump a snapshot of the worker serving this request."""
+    try:
+        return jsonify(memory.take_snapshot()), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+
+
+@app.route('/api/admin/memory/top', methods=['GET'])
+@admin_required
+def memory_top():
+    """Largest allocation sites in ?snapshot= (or right now), grouped by ?group_by=lineno|filename."""
+    try:
+        stats = memory.top(
+            request.args.get('snapshot'),
+            request.args.get('group_by', 'lineno'),
+            int(request.args.get('limit', 25))
+        )
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'pid': os.getpid(), 'stats': stats})
+
+
+@app.route('/api/admin/memory/diff', methods=['GET'])
+@admin_required
+def memory_diff():
+    """Top growth from ?from= to ?to= (or right now), grouped by ?group_by=lineno|filename."""
+    if not request.args.get('from'):
+        return jsonify({'error': 'from snapshot is required'}), 400
+    try:
+        stats = memory.compare(
+            request.args['from'],
+            request.args.get('to'),
+            request.args.get('group_by', 'lineno'),
+            int(request.args.get('limit', 25))
+        )
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'pid': os.getpid(), 'stats': stats})
+
+
 @app.route('/api/emby/layouts/template', methods=['POST'])
 def create_emby_layout_template():
     """Create a new Emby layout template."""
@@ -904,7 +1723,7 @@ def create_emby_layout_template():
     template = EmbyLayoutTemplate(
         name=name,
         description=description,
-        json_blob=json.dumps(payload),
+        content_hash=LayoutBlob.store(payload).content_hash,
     )
     db.session.add(template)
     db.session.commit()
@@ -913,9 +1732,21 @@ def create_emby_layout_template():
 
 @app.route('/api/emby/layouts/templates', methods=['GET'])
 def list_emby_layout_templates():
-    """List Emby layout templates."""
+    """List Emby layout template summaries; fetch one by id for its JSON."""
     templates = EmbyLayoutTemplate.query.order_by(EmbyLayoutTemplate.created_at.desc()).all()
-    return jsonify([t.to_dict() for t in templates])
+    return jsonify([t.to_dict(include_json=False) for t in templates])
+
+
+@app.route('/api/emby/layouts/template/<int:template_id>', methods=['GET'])
+def get_emby_layout_template(template_id):
+    """Get one Emby layout template with its JSON; honours If-None-Match."""
+    template = EmbyLayoutTemplate.query.get(template_id)
+    if not template:
+        return jsonify({'error': 'Template not found'}), 404
+    response = jsonify(template.to_dict())
+    if template.content_hash:
+        response.set_etag(f'{template.id}-{template.content_hash}')
+    return response.make_conditional(request)
 
 
 @app.route('/api/emby/layouts/template/<int:template_id>', methods=['DELETE'])
@@ -924,11 +1755,14 @@ def delete_emby_layout_template(template_id):
     template = EmbyLayoutTemplate.query.get(template_id)
     if not template:
         return jsonify({'error': 'Template not found'}), 404
+    content_hash = template.content_hash
     db.session.delete(template)
+    # Blobs are shared by identical templates; drop one once nothing uses it
+    if content_hash and not EmbyLayoutTemplate.query.filter_by(content_hash=content_hash).first():
+        LayoutBlob.query.filter_by(content_hash=content_hash).delete()
     db.session.commit()
     return jsonify({'message': 'Template deleted'})
 
-
 # ============ Audiobookshelf Collections ============
 
 @app.route('/api/servers/<int:server_id>/users/<user_id>/collections', methods=['GET', 'POST'])
@@ -951,17 +1785,22 @@ def abs_collections(server_id, user_id):
                     )
                 except Exception:
                     collections = []
+            # Collections listed without item ids need a detail fetch; do those together
+            missing = [
+                abs_collection_id(c) for c in collections
+                if abs_collection_id(c) and not abs_collection_item_ids(c)[0]
+            ]
+            snapshot = server_snapshot(server)
+            details = dict(zip(missing, gather_async(
+                async_server_request(snapshot, f'/api/collections/{collection_id}') for collection_id in missing
+            )))
             result = []
             for collection in collections:
                 collection_id = abs_collection_id(collection)
                 item_ids, _ = abs_collection_item_ids(collection)
-                if collection_id and not item_ids:
-                    try:
-                        detail = server_request(server, f'/api/collections/{collection_id}')
-                        if isinstance(detail, dict):
-                            item_ids, _ = abs_collection_item_ids(detail)
-                    except Exception:
-                        pass
+                detail = details.get(collection_id)
+                if not item_ids and isinstance(detail, dict):
+                    item_ids, _ = abs_collection_item_ids(detail)
                 result.append({
                     'Id': collection_id,
                     'Name': collection.get('name', 'Unknown'),
@@ -1193,25 +2032,33 @@ def get_items(server_id):
         elif server.server_type == 'audiobookshelf':
             libs = server_request(server, '/api/libraries').get('libraries', [])
             abs_items = []
+            skipped = []
 
             if search:
-                # Use native search endpoint for each library
-                for lib in libs:
-                    try:
-                        search_result = server_request(
-                            server,
-                            f'/api/libraries/{lib["id"]}/search',
-                            params={'q': search, 'limit': limit}
-                        )
-                        # Search returns different structure: book/podcast results
-                        for key in ('book', 'podcast', 'audiobook', 'libraryItems'):
-                            if key in search_result and isinstance(search_result[key], list):
-                                abs_items.extend(search_result[key])
-                        # Also check for direct results array
-                        if isinstance(search_result, list):
-                            abs_items.extend(search_result)
-                    except Exception as e:
-                        log_service('Search', f'ABS library {lib.get("id")} search failed: {e}', level='warning')
+                # Use native search endpoint for each library, all libraries at once
+                snapshot = server_snapshot(server)
+                search_results = gather_async(
+                    async_server_request(
+                        snapshot,
+                        f'/api/libraries/{lib["id"]}/search',
+                        params={'q': search, 'limit': limit}
+                    )
+                    for lib in libs
+                )
+                for lib, search_result in zip(libs, search_results):
+                    if isinstance(search_result, DeadlineExceeded):
+                        skipped.append({'library_id': lib.get('id'), 'name': lib.get('name'), 'reason': 'deadline'})
+                        continue
+                    if isinstance(search_result, Exception):
+                        log_service('Search', f'ABS library {lib.get("id")} search failed: {search_result}', level='warning')
+                        continue
+                    # Search returns different structure: book/podcast results
+                    for key in ('book', 'podcast', 'audiobook', 'libraryItems'):
+                        if key in search_result and isinstance(search_result[key], list):
+                            abs_items.extend(search_result[key])
+                    # Also check for direct results array
+                    if isinstance(search_result, list):
+                        abs_items.extend(search_result)
             elif parent_id:
                 result = server_request(
                     server,
@@ -1221,12 +2068,17 @@ def get_items(server_id):
                 abs_items = result.get('results', [])
             else:
                 # Get items from all libraries
-                for lib in libs:
-                    lib_items = server_request(
-                        server,
-                        f'/api/libraries/{lib["id"]}/items',
-                        params={'limit': limit}
-                    )
+                snapshot = server_snapshot(server)
+                lib_results = gather_async(
+                    async_server_request(snapshot, f'/api/libraries/{lib["id"]}/items', params={'limit': limit})
+                    for lib in libs
+                )
+                for lib, lib_items in zip(libs, lib_results):
+                    if isinstance(lib_items, DeadlineExceeded):
+                        skipped.append({'library_id': lib.get('id'), 'name': lib.get('name'), 'reason': 'deadline'})
+                        continue
+                    if isinstance(lib_items, Exception):
+                        raise lib_items
                     abs_items.extend(lib_items.get('results', []))
 
             # Handle search results which may have nested libraryItem
@@ -1240,7 +2092,7 @@ def get_items(server_id):
             items = [abs_map_item(item) for item in normalized_items]
             if search:
                 log_service('Search', f'Found {len(items)} results for "{search}" on audiobookshelf')
-            return jsonify({'Items': items, 'TotalRecordCount': len(items)})
+            return jsonify({'Items': items, 'TotalRecordCount': len(items), **partial_result(skipped)})
 
         else:  # emby or jellyfin
             include_types = request.args.get('types', 'Movie,Series,AudioBook')
@@ -1332,8 +2184,10 @@ def get_favorites(server_id, user_id):
             except Exception:
                 libs = server_request(server, '/api/libraries').get('libraries', [])
                 items = []
-                for lib in libs:
-                    lib_items = server_request(server, f'/api/libraries/{lib["id"]}/items')
+                snapshot = server_snapshot(server)
+                for lib_items in gather_async((
+                    async_server_request(snapshot, f'/api/libraries/{lib["id"]}/items') for lib in libs
+                ), return_exceptions=False):
                     for item in lib_items.get('results', []):
                         tags = item.get('media', {}).get('tags', [])
                         if 'Favorite' in tags or 'favorite' in tags:
@@ -1565,9 +2419,12 @@ def get_recent(server_id):
             if parent_id:
                 libs = [lib for lib in libs if str(lib.get('id')) == str(parent_id)]
             items = []
-            for lib in libs:
-                lib_items = server_request(server, f'/api/libraries/{lib["id"]}/items',
-                                          params={'sort': 'addedAt', 'desc': 1, 'limit': limit})
+            snapshot = server_snapshot(server)
+            for lib_items in gather_async((
+                async_server_request(snapshot, f'/api/libraries/{lib["id"]}/items',
+                                     params={'sort': 'addedAt', 'desc': 1, 'limit': limit})
+                for lib in libs
+            ), return_exceptions=False):
                 for item in lib_items.get('results', []):
                     items.append(abs_map_item(item))
             return jsonify({'Items': items[:limit], 'TotalRecordCount': len(items)})
@@ -1626,13 +2483,8 @@ def get_image(server_id, item_id):
             url = f"{server.url.rstrip('/')}/Items/{item_id}/Images/{image_type}"
             params = {'maxWidth': max_width, 'api_key': server.api_key}
 
-        response = requests.get(url, params=params, headers=get_server_headers(server), timeout=30)
-        response.raise_for_status()
-
-        return Response(
-            response.content,
-            mimetype=response.headers.get('Content-Type', 'image/jpeg')
-        )
+        content, content_type = server_fetch_image(server, url, params=params, timeout=30)
+        return Response(content, mimetype=content_type)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
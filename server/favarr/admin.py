@@ -0,0 +1,29 @@
+"""Admin-only access for diagnostic endpoints, gated by FAVARR_ADMIN_TOKEN."""
+
+import hmac
+import os
+from functools import wraps
+
+from flask import jsonify, request
+
+ADMIN_TOKEN = os.environ.get("FAVARR_ADMIN_TOKEN", "")
+
+
+def is_admin_request() -> bool:
+    """True when the request carries the configured admin token."""
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+def admin_required(view):
+    """Refuse the view unless is_admin_request(); 403 when no token is configured."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled; set FAVARR_ADMIN_TOKEN'}), 403
+        if not is_admin_request():
+            return jsonify({'error': 'Admin token required'}), 401
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,208 @@
+"""Per-worker concurrency limits by route class; requests over a limit wait briefly, then get 429."""
+
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import g, jsonify, request
+
+from .services import remaining_time
+
+ADMISSION_QUEUE_WAIT = float(os.environ.get("FAVARR_ADMISSION_QUEUE_WAIT", "1"))  # seconds
+IMAGE_QUEUE_WAIT = float(os.environ.get("FAVARR_ADMISSION_IMAGE_WAIT", "15"))  # seconds
+WORKER_THREADS = int(os.environ.get("FAVARR_WORKER_THREADS", "4"))  # keep in step with gunicorn --threads
+RESERVED_THREADS = 1  # never handed to limited classes, so exempt routes always get a thread
+SHARED_LIMIT = max(1, WORKER_THREADS - RESERVED_THREADS)
+
+# name -> per-worker concurrent requests (0 = unlimited)
+CLASS_LIMITS = {
+    "heavy": int(os.environ.get("FAVARR_ADMISSION_HEAVY", str(max(1, WORKER_THREADS // 4)))),
+    "interactive": int(os.environ.get("FAVARR_ADMISSION_INTERACTIVE", str(max(1, WORKER_THREADS // 2)))),
+    "image": int(os.environ.get("FAVARR_ADMISSION_IMAGE", str(max(1, WORKER_THREADS // 2)))),
+    "stream": int(os.environ.get("FAVARR_ADMISSION_STREAM", "1")),  # long-lived responses (SSE); others poll
+    "exempt": 0,
+}
+CLASS_WAITS = {"image": IMAGE_QUEUE_WAIT}  # <img> tags cannot retry a 429, so posters queue instead
+
+HEAVY_ITEM_LIMIT = 500
+
+
+def _large_item_listing(args) -> bool:
+    # Browsing a library or searching is interactive; a big page or the
+    # all-libraries listing (ABS defaults to 3500 items) is heavy.
+    try:
+        if int(args.get("limit", 0)) >= HEAVY_ITEM_LIMIT:
+            return True
+    except ValueError:
+        pass
+    return not (args.get("parent_id") or args.get("search") or args.get("limit"))
+
+
+# (path pattern, methods or None for all, optional predicate on request args, class).
+# First match wins; other /api routes are interactive and everything else exempt.
+ROUTE_RULES: List[Tuple[Any, Optional[set], Optional[Callable], str]] = [
+    (re.compile(r"^/api/health$"), None, None, "exempt"),
+    (re.compile(r"^/api/diagnostics/"), None, None, "exempt"),
+    (re.compile(r"^/api/admin/"), None, None, "exempt"),
+    (re.compile(r"^/api/servers/health$"), None, None, "exempt"),
+    (re.compile(r"^/api/metrics$"), None, None, "exempt"),
+    (re.compile(r"^/api/stats/(quick|collect/status)$"), None, None, "exempt"),
+    (re.compile(r"^/api/logs/stream$"), None, None, "stream"),
+    (re.compile(r"^/api/servers/\d+/image/"), {"GET"}, None, "image"),
+    (re.compile(r"^/api/stats$"), {"GET"}, None, "heavy"),
+    (re.compile(r"^/api/servers/\d+/items$"), {"GET"}, _large_item_listing, "heavy"),
+]
+
+
+class AdmissionClass:
+    """Counting semaphore with a bounded wait and rejection metrics."""
+
+    def __init__(self, name: str, limit: int, queue_wait: float = ADMISSION_QUEUE_WAIT):
+        self.name = name
+        self.limit = limit
+        self.queue_wait = queue_wait
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.avg_seconds = 0.0  # EWMA of request duration
+
+    def acquire(self, wait: float) -> bool:
+        """Take a slot, waiting up to wait seconds; False if none came free."""
+        with self._cond:
+            if self.limit > 0 and self.in_flight >= self.limit:
+                self.queued += 1
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + wait
+                    while self.in_flight >= self.limit:
+                        left = deadline - time.monotonic()
+                        if left <= 0:
+                            self.rejected += 1
+                            return False
+                        self._cond.wait(left)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.admitted += 1
+            return True
+
+    def release(self, duration: float):
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_seconds = duration if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * duration
+            self._cond.notify()
+
+    def abandon(self):
+        """Give back a slot that was never used (the request was turned away elsewhere)."""
+        with self._cond:
+            self.in_flight -= 1
+            self.admitted -= 1
+            self._cond.notify()
+
+    def retry_after(self) -> int:
+        """Whole seconds a rejected client should wait: about one request's duration."""
+        return max(1, math.ceil(self.avg_seconds))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "peak": self.peak,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "avg_ms": round(self.avg_seconds * 1000, 1),
+            }
+
+
+classes: Dict[str, AdmissionClass] = {
+    name: AdmissionClass(name, limit, CLASS_WAITS.get(name, ADMISSION_QUEUE_WAIT))
+    for name, limit in CLASS_LIMITS.items()
+}
+# Taken by every limited request on top of its class slot.
+shared = AdmissionClass("shared", SHARED_LIMIT)
+
+
+def classify(path: str, method: str, args) -> str:
+    """Admission class name for a request."""
+    for pattern, methods, predicate, name in ROUTE_RULES:
+        if not pattern.match(path):
+            continue
+        if methods and method not in methods:
+            continue
+        if predicate and not predicate(args):
+            continue
+        return name
+    return "interactive" if path.startswith("/api/") else "exempt"
+
+
+def admission_state() -> Dict[str, Any]:
+    """Per-class counters for this worker, plus the shared pool."""
+    state = {name: cls.snapshot() for name, cls in classes.items()}
+    state["shared"] = shared.snapshot()
+    return state
+
+
+def _admit():
+    cls = classes[classify(request.path, request.method, request.args)]
+    if cls.limit <= 0:
+        return None
+    remaining = remaining_time()
+    wait = cls.queue_wait if remaining is None else max(0.0, min(cls.queue_wait, remaining))
+    queued_until = time.monotonic() + wait
+    if not cls.acquire(wait):
+        return _busy(cls)
+    if not shared.acquire(max(0.0, queued_until - time.monotonic())):
+        cls.abandon()
+        return _busy(cls)
+    g.admission = (cls, time.monotonic())
+    return None
+
+
+def _busy(cls: AdmissionClass):
+    response = jsonify({"error": "Server is busy, please retry shortly", "class": cls.name})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(cls.retry_after())
+    return response
+
+
+def _release_ticket(ticket):
+    cls, started = ticket
+    duration = time.monotonic() - started
+    shared.release(duration)
+    cls.release(duration)
+
+
+def _release(exc=None):
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        _release_ticket(ticket)
+
+
+def detach() -> Callable[[], None]:
+    """Keep this request's slot past teardown; call the returned function to free it."""
+    ticket = g.pop("admission", None)
+    released = []
+
+    def release():
+        if ticket is not None and not released:
+            released.append(True)
+            _release_ticket(ticket)
+
+    return release
+
+
+def init_app(app):
+    """Register the admission hooks; call after hooks whose work should precede queueing."""
+    app.before_request(_admit)
+    app.teardown_request(_release)
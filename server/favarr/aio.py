@@ -0,0 +1,371 @@
+"""Asyncio counterparts of server_request/stremio_request for fan-out, on one event loop per process."""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from .cache import LEASE_WAIT, FlightTimeout
+from .services import (
+    CONNECT_TIMEOUT,
+    LIMITER_MAX_WAIT,
+    STREMIO_READ_METHODS,
+    DeadlineExceeded,
+    ServerBusyError,
+    ServerUnavailableError,
+    _limiter_settings,
+    _cache_key,
+    _parse_body,
+    _server_key,
+    _session_cache_key,
+    _stremio_base,
+    adaptive_timeout,
+    cache_plan,
+    claim_revalidation,
+    deadline_expired,
+    deadline_timeout,
+    endpoint_class,
+    get_circuit_breaker,
+    get_latency_tracker,
+    get_response_cache,
+    get_server_headers,
+    get_server_limiter,
+    inflight_reads,
+    invalidate_after_write,
+    lookup_cached,
+    notify_upstream_call,
+    on_server_reset,
+    release_revalidation,
+    remaining_time,
+    set_deadline,
+    store_cached,
+    stremio_cache_plan,
+)
+
+_loop_state: Dict[str, Any] = {"loop": None, "pid": None, "thread": None}
+_loop_lock = threading.Lock()
+
+DEADLINE_GRACE = 0.25  # seconds gather_async waits past the deadline before cancelling
+
+# Only touched from the loop thread.
+_pools: Dict[Any, "_AsyncPool"] = {}
+
+
+class _AsyncPool:
+    def __init__(self, fingerprint: tuple, size: int):
+        self.fingerprint = fingerprint
+        self.size = size
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=size, keepalive_timeout=60))
+        self.requests = 0
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's event loop, starting its thread on first use."""
+    with _loop_lock:
+        if _loop_state["loop"] is None or _loop_state["pid"] != os.getpid():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="favarr-aio", daemon=True)
+            thread.start()
+            _pools.clear()  # any pools belonged to the parent's loop
+            _loop_state.update(loop=loop, pid=os.getpid(), thread=thread)
+        return _loop_state["loop"]
+
+
+async def _in_context(coro: Awaitable, context: contextvars.Context):
+    # The task runs in its own copy of the loop thread's context; adopt the
+    # submitting thread's values (such as the request deadline) instead.
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def submit_async(coro: Awaitable) -> concurrent.futures.Future:
+    """Schedule a coroutine on the shared loop; returns a thread-safe future."""
+    loop = get_loop()
+    if threading.current_thread() is _loop_state["thread"]:
+        raise RuntimeError("submit_async cannot be called from the event loop thread")
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), loop)
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = None):
+    """Run a coroutine on the shared loop and block the calling thread for its result."""
+    return submit_async(coro).result(timeout)
+
+
+async def _gather(coros: List[Awaitable], return_exceptions: bool, timeout: Optional[float]):
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if timeout is None:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    # Calls cut off by the deadline get a moment to return their own partial results.
+    _, pending = await asyncio.wait(tasks, timeout=max(timeout, 0) + DEADLINE_GRACE)
+    for task in pending:
+        task.cancel()
+    results = []
+    for task in tasks:
+        if task in pending:
+            error: BaseException = DeadlineExceeded("request deadline exceeded")
+        elif task.exception() is not None:
+            error = task.exception()
+        else:
+            results.append(task.result())
+            continue
+        if not return_exceptions:
+            raise error
+        results.append(error)
+    return results
+
+
+def gather_async(coros: Iterable[Awaitable], return_exceptions: bool = True) -> List[Any]:
+    """Run coroutines concurrently, results in order; failures and calls cut off by the deadline yield exceptions."""
+    coros = list(coros)
+    if not coros:
+        return []
+    return run_async(_gather(coros, return_exceptions, remaining_time()))
+
+
+def _get_session(server) -> aiohttp.ClientSession:
+    key = _server_key(server)
+    fingerprint = _session_cache_key(server)
+    size = _limiter_settings(server)[0]
+    pool = _pools.get(key)
+    if pool is not None and (pool.fingerprint != fingerprint or pool.size != size):
+        asyncio.ensure_future(pool.session.close())
+        pool = None
+    if pool is None:
+        pool = _pools[key] = _AsyncPool(fingerprint, size)
+    pool.requests += 1
+    return pool.session
+
+
+def _discard_pool(key):
+    pool = _pools.pop(key, None)
+    if pool is not None:
+        asyncio.ensure_future(pool.session.close())
+
+
+@on_server_reset
+def _discard_server_pool(server):
+    loop = _loop_state["loop"]
+    if loop is not None and _loop_state["pid"] == os.getpid():
+        loop.call_soon_threadsafe(_discard_pool, _server_key(server))
+
+
+def async_pool_state() -> Dict[str, Any]:
+    """Async pool sizes and request counts, keyed by server."""
+    return {
+        str(key): {"size": pool.size, "requests": pool.requests, "closed": pool.session.closed}
+        for key, pool in list(_pools.items())
+    }
+
+
+def _describe(exc: BaseException) -> str:
+    if isinstance(exc, asyncio.TimeoutError) and not str(exc):
+        return "request timed out"
+    return str(exc) or exc.__class__.__name__
+
+
+def _clean_params(params: Optional[Dict]) -> Optional[Dict[str, str]]:
+    # requests drops None and str()s everything else; aiohttp insists on strings.
+    if not params:
+        return None
+    return {str(k): str(v) for k, v in params.items() if v is not None}
+
+
+# aiohttp >= 3.10 tells connect timeouts apart; those always count against the breaker.
+_CONNECT_TIMEOUTS = getattr(aiohttp, "ConnectionTimeoutError", ())
+
+
+async def _guarded_send(server, label: str, endpoint_cls: str, send, timeout: float, adaptive: bool = False):
+    """Breaker, limiter and latency bookkeeping around one async upstream call."""
+    breaker = get_circuit_breaker(server)
+    if not breaker.allow():
+        raise ServerUnavailableError(
+            f"{label}: server unavailable (circuit open, retry in {breaker.retry_after():.0f}s)"
+        )
+    limiter = get_server_limiter(server)
+    try:
+        await limiter.acquire_async(deadline_timeout(LIMITER_MAX_WAIT, label))
+    except ServerBusyError as exc:
+        breaker.abandon()
+        if deadline_expired():
+            raise DeadlineExceeded(f"{label}: request deadline exceeded") from exc
+        raise
+    except BaseException:
+        breaker.abandon()
+        raise
+    tracker = get_latency_tracker(server, endpoint_cls)
+    started = time.monotonic()
+    try:
+        timeout = deadline_timeout(timeout, label)
+        # With a deadline the whole call, not just each socket read, must fit in it.
+        total = timeout if remaining_time() is not None else None
+        client_timeout = aiohttp.ClientTimeout(
+            total=total, sock_connect=min(CONNECT_TIMEOUT, timeout), sock_read=timeout
+        )
+        status, body = await send(_get_session(server), client_timeout)
+    except DeadlineExceeded:
+        breaker.abandon()
+        raise
+    except asyncio.TimeoutError as exc:
+        notify_upstream_call(server, endpoint_cls, time.monotonic() - started, error=exc)
+        if deadline_expired():
+            breaker.abandon()
+            raise DeadlineExceeded(f"{label}: request deadline exceeded") from exc
+        tracker.record(time.monotonic() - started)
+        if adaptive and not isinstance(exc, _CONNECT_TIMEOUTS):
+            breaker.abandon()
+            raise
+        breaker.record_failure(_describe(exc))
+        raise
+    except aiohttp.ClientConnectionError as exc:
+        notify_upstream_call(server, endpoint_cls, time.monotonic() - started, error=exc)
+        breaker.record_failure(_describe(exc))
+        raise
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except Exception as exc:
+        elapsed = time.monotonic() - started
+        tracker.record(elapsed)
+        notify_upstream_call(server, endpoint_cls, elapsed, status=getattr(exc, "status", None), error=exc)
+        breaker.record_success()
+        raise
+    finally:
+        limiter.release()
+    elapsed = time.monotonic() - started
+    tracker.record(elapsed)
+    notify_upstream_call(server, endpoint_cls, elapsed, status=status)
+    breaker.record_success()
+    return body
+
+
+async def _read_body(response: aiohttp.ClientResponse) -> Tuple[int, bytes]:
+    response.raise_for_status()
+    return response.status, await response.read()
+
+
+async def _revalidate(plan, fetch):
+    set_deadline(None)  # a background refresh is not bound by the triggering request's budget
+    try:
+        await asyncio.to_thread(store_cached, plan, await fetch())
+    except Exception:
+        pass  # the stale copy stays; the next read retries
+    finally:
+        await asyncio.to_thread(release_revalidation, plan)
+
+
+async def _coalesced_read(flight_key: str, fetch):
+    """Async ``coalesced_read``: the shared fetch runs free of any caller's deadline."""
+
+    async def detached():
+        set_deadline(None)  # the shared task runs in its own copy of the context
+        return await fetch()
+
+    try:
+        return await inflight_reads.do_async(flight_key, detached, timeout=remaining_time())
+    except FlightTimeout as exc:
+        raise DeadlineExceeded("Upstream call: request deadline exceeded") from exc
+
+
+async def _serve_cached(plan, fetch):
+    """Cached body for plan, scheduling a background refresh if it is stale."""
+    if plan is None:
+        return None
+    # Cache calls may block on SQLite locks held by other workers: keep them off the loop.
+    body, stale = await asyncio.to_thread(lookup_cached, plan)
+    if stale and await asyncio.to_thread(claim_revalidation, plan):
+        asyncio.ensure_future(_revalidate(plan, fetch))
+    return body
+
+
+async def _read_through(plan, flight_key: str, fetch):
+    """Async ``_read_through``: cache, then one fetch per key per process and per deployment."""
+    body = await _serve_cached(plan, fetch)
+    if body is not None:
+        return body
+    if plan is None:
+        return await _coalesced_read(flight_key, fetch)
+    key, ttl, tags, stale_for = plan
+    return await _coalesced_read(
+        key,
+        lambda: get_response_cache().get_or_compute_async(key, ttl, fetch, tags, wait=LEASE_WAIT, stale_for=stale_for),
+    )
+
+
+async def async_server_request(
+    server,
+    endpoint: str,
+    method: str = "GET",
+    params: Optional[Dict] = None,
+    data: Any = None,
+    timeout: float = 20,
+    use_cache: bool = True,
+):
+    """Async ``server_request``: same headers, timeouts, cache and error messages."""
+    if server.server_type == "stremio":
+        raise ValueError("server_request is not supported for Stremio; use stremio_request instead")
+    plan = cache_plan(server, method, endpoint, params, use_cache)
+    url = f"{server.url.rstrip('/')}{endpoint}"
+    endpoint_cls = endpoint_class(method, endpoint, params)
+    read_timeout = adaptive_timeout(server, endpoint_cls, timeout) if method.upper() == "GET" else timeout
+
+    async def send(session, client_timeout):
+        async with session.request(
+            method,
+            url,
+            headers=get_server_headers(server),
+            params=_clean_params(params),
+            json=data,
+            timeout=client_timeout,
+        ) as response:
+            return await _read_body(response)
+
+    def fetch():
+        return _guarded_send(server, "Server API error", endpoint_cls, send, read_timeout, read_timeout < timeout)
+
+    try:
+        if method.upper() == "GET":
+            body = await _read_through(plan, _cache_key(server, endpoint, params), fetch)
+        else:
+            body = await fetch()
+        return _parse_body(body)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+        raise Exception(f"Server API error: {_describe(exc)}") from exc
+    finally:
+        if method.upper() != "GET":
+            await asyncio.to_thread(invalidate_after_write, server, method, endpoint)
+
+
+async def async_stremio_request(server, method: str, params: Optional[Dict] = None, timeout: float = 20, use_cache: bool = True):
+    """Async ``stremio_request``."""
+    if not server.token:
+        raise Exception("Stremio authKey is required")
+    plan = stremio_cache_plan(server, method, params, use_cache)
+    url = f"{_stremio_base(server)}/{method}"
+    payload: Dict[str, Any] = {"type": method[0].upper() + method[1:]}
+    payload["authKey"] = server.token
+    if params:
+        payload.update(params)
+    endpoint_cls = f"POST /api/{method}"
+    read_timeout = adaptive_timeout(server, endpoint_cls, timeout) if method in STREMIO_READ_METHODS else timeout
+
+    async def send(session, client_timeout):
+        async with session.post(url, json=payload, headers=get_server_headers(server), timeout=client_timeout) as response:
+            return await _read_body(response)
+
+    def fetch():
+        return _guarded_send(server, "Stremio API error", endpoint_cls, send, read_timeout, read_timeout < timeout)
+
+    try:
+        if method in STREMIO_READ_METHODS:
+            body = await _read_through(plan, _cache_key(server, f"/api/{method}", params), fetch)
+        else:
+            body = await fetch()
+        return _parse_body(body)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+        raise Exception(f"Stremio API error: {_describe(exc)}") from exc
@@ -0,0 +1,634 @@
+"""Response caches: a per-process LRU and a SQLite file shared by all workers."""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+CACHE_MAX_ENTRIES = int(os.environ.get("FAVARR_CACHE_MAX_ENTRIES", "2000"))
+CACHE_MAX_BYTES = int(float(os.environ.get("FAVARR_CACHE_MAX_MB", "64")) * 1024 * 1024)
+LEASE_WAIT = 30.0  # seconds a get_or_compute waits on another worker's computation
+# Coordination state kept in the cache (leases, shared switches, counters). LRU
+# eviction skips these: dropping a lease mid-computation lets a second worker
+# compute the same key, and dropping a switch forgets it. They are tiny and
+# expire on their own.
+PINNED_PREFIXES = ("lease:", "revalidate:", "stats:", "profile:", "memory:", "metrics:", "health:", "startup-checks")
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface shared by the cache backends."""
+
+    name = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), stale_for: float = 0):
+        """Store value for ttl seconds; get_stale may still return it for stale_for more."""
+        raise NotImplementedError
+
+    def get_stale(self, key: str) -> Optional[bytes]:
+        """Return a value even if expired, as long as it is within its stale window."""
+        raise NotImplementedError
+
+    def expire_all(self):
+        """Mark every entry expired; entries with a stale window remain available to get_stale."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store only if key is absent or expired; True if this call stored it."""
+        raise NotImplementedError
+
+    def incr(self, key: str, delta: int = 1, ttl: float = 3600) -> Optional[int]:
+        """Atomically add delta to an integer value (missing counts as 0); None if the store failed."""
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        return 0
+
+    def get_or_compute(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], bytes],
+        tags: Iterable[str] = (),
+        wait: float = LEASE_WAIT,
+        stale_for: float = 0,
+    ) -> bytes:
+        """Return the cached value or compute it, one computation per key across workers; lookups are not counted."""
+        value = self.peek(key)
+        if value is not None:
+            return value
+        lease = f"lease:{key}"
+        deadline = time.monotonic() + wait
+        while True:
+            if self.add(lease, b"1", wait):
+                try:
+                    value = self.peek(key)
+                    if value is None:
+                        value = compute()
+                        self.set(key, value, ttl, tags, stale_for)
+                    return value
+                finally:
+                    self.delete(lease)
+            time.sleep(0.05)
+            value = self.peek(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                value = compute()
+                self.set(key, value, ttl, tags, stale_for)
+                return value
+
+    async def get_or_compute_async(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[bytes]],
+        tags: Iterable[str] = (),
+        wait: float = LEASE_WAIT,
+        stale_for: float = 0,
+    ) -> bytes:
+        """``get_or_compute`` for an event loop, with every cache call kept off the loop."""
+        value = await asyncio.to_thread(self.peek, key)
+        if value is not None:
+            return value
+        lease = f"lease:{key}"
+        deadline = time.monotonic() + wait
+        while True:
+            if await asyncio.to_thread(self.add, lease, b"1", wait):
+                try:
+                    value = await asyncio.to_thread(self.peek, key)
+                    if value is None:
+                        value = await compute()
+                        await asyncio.to_thread(self.set, key, value, ttl, tags, stale_for)
+                    return value
+                finally:
+                    await asyncio.to_thread(self.delete, lease)
+            await asyncio.sleep(0.05)
+            value = await asyncio.to_thread(self.peek, key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                value = await compute()
+                await asyncio.to_thread(self.set, key, value, ttl, tags, stale_for)
+                return value
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """get() without touching hit/miss counters, for reading shared state rather than cached responses."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Thread-safe LRU with per-entry TTL, bounded by entry count and bytes."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, stale_until, value, tags)
+        self._tags: Dict[str, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str, stale: bool = False) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if entry[1] <= now:
+            self._remove(key)
+            return None
+        if entry[0] <= now and not stale:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._lookup(key)
+        self._count(value is not None)
+        return value
+
+    def peek(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._lookup(key)
+
+    def get_stale(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._lookup(key, stale=True)
+
+    def _store(self, key: str, value: bytes, expires_at: float, tags: tuple, stale_until: Optional[float] = None):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, expires_at if stale_until is None else stale_until, value, tags)
+        self._bytes += len(value)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            victim = next((k for k in self._entries if not k.startswith(PINNED_PREFIXES)), None)
+            if victim is None:
+                break
+            self._remove(victim)
+            self.evictions += 1
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), stale_for: float = 0):
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, value, expires_at, tuple(tags), expires_at + stale_for)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            if self._lookup(key) is not None:
+                return False
+            self._store(key, value, time.time() + ttl, ())
+            return True
+
+    def incr(self, key: str, delta: int = 1, ttl: float = 3600) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            alive = entry is not None and entry[0] > time.time()
+            current = int(entry[2]) if alive else 0
+            expires_at = entry[0] if alive else time.time() + ttl
+            self._store(key, str(current + delta).encode(), expires_at, ())
+            return current + delta
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of the tags; returns how many were removed."""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def expire_all(self):
+        now = time.time()
+        with self._lock:
+            for key, (expires_at, stale_until, value, tags) in list(self._entries.items()):
+                self._entries[key] = (min(expires_at, now), stale_until, value, tags)
+        self.purge_expired()
+
+    def save(self, path: str) -> int:
+        """Write entries that have a stale window to path; returns how many were saved."""
+        now = time.time()
+        with self._lock:
+            entries = [
+                {"key": key, "expires_at": e[0], "stale_until": e[1], "value": base64.b64encode(e[2]).decode("ascii"), "tags": list(e[3])}
+                for key, e in self._entries.items()
+                if e[1] > max(e[0], now)
+            ]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": now, "entries": entries}, f)
+        os.replace(tmp, path)
+        return len(entries)
+
+    def load(self, path: str) -> int:
+        """Restore entries saved by save(), already expired so they are revalidated on use."""
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("entries", [])
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for entry in entries:
+                if entry["stale_until"] <= now:
+                    continue
+                value = base64.b64decode(entry["value"])
+                self._store(entry["key"], value, min(entry["expires_at"], now), tuple(entry["tags"]), entry["stale_until"])
+                loaded += 1
+        return loaded
+
+    def _remove(self, key: str):
+        _, _, value, tags = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        data = super().stats()
+        with self._lock:
+            data.update(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+            )
+        return data
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at);
+CREATE TABLE IF NOT EXISTS cache_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+);
+CREATE INDEX IF NOT EXISTS cache_tags_key ON cache_tags (key);
+"""
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache in a WAL-mode SQLite file shared by all workers; SQLite errors degrade to a miss or no-op."""
+
+    name = "sqlite"
+    ACCESS_RESOLUTION = 30.0  # seconds; LRU recency is only rewritten this often
+    ENFORCE_EVERY = 32  # writes between size-limit checks
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+            if columns and "stale_until" not in columns:
+                # Cache files from before stale windows; the contents are disposable.
+                conn.executescript("DROP TABLE cache; DROP TABLE IF EXISTS cache_tags;")
+            conn.executescript(_SQLITE_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _lookup(self, key: str, stale: bool = False) -> Optional[bytes]:
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, stale_until, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[2] <= now:
+                conn.execute("DELETE FROM cache WHERE key = ? AND stale_until <= ?", (key, now))
+                return None
+            if row[1] <= now and not stale:
+                return None
+            if now - row[3] > self.ACCESS_RESOLUTION:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return bytes(row[0])
+        except sqlite3.Error as exc:
+            logger.warning("Cache read failed for %s: %s", key, exc)
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._lookup(key)
+        self._count(value is not None)
+        return value
+
+    def peek(self, key: str) -> Optional[bytes]:
+        return self._lookup(key)
+
+    def get_stale(self, key: str) -> Optional[bytes]:
+        return self._lookup(key, stale=True)
+
+    def _write(self, conn, key: str, value: bytes, expires_at: float, tags: Iterable[str], stale_for: float = 0):
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until, size, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), expires_at, expires_at + stale_for, len(value), time.time()),
+        )
+        conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+        conn.executemany("INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)", [(t, key) for t in tags])
+
+    def set(self, key: str, value: bytes, ttl: float, tags: Iterable[str] = (), stale_for: float = 0):
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        try:
+            with self._transaction() as conn:
+                self._write(conn, key, value, time.time() + ttl, tuple(tags), stale_for)
+            self._writes += 1
+            if self._writes % self.ENFORCE_EVERY == 0:
+                self._enforce_limits()
+        except sqlite3.Error as exc:
+            logger.warning("Cache write failed for %s: %s", key, exc)
+
+    def delete(self, key: str):
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+        except sqlite3.Error as exc:
+            logger.warning("Cache delete failed for %s: %s", key, exc)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        try:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > time.time():
+                    return False
+                self._write(conn, key, value, time.time() + ttl, ())
+                return True
+        except sqlite3.Error as exc:
+            logger.warning("Cache add failed for %s: %s", key, exc)
+            return True  # act alone rather than wait on a lease nobody holds
+
+    def incr(self, key: str, delta: int = 1, ttl: float = 3600) -> Optional[int]:
+        try:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                alive = row is not None and row[1] > time.time()
+                current = int(bytes(row[0])) if alive else 0
+                expires_at = row[1] if alive else time.time() + ttl
+                self._write(conn, key, str(current + delta).encode(), expires_at, ())
+                return current + delta
+        except sqlite3.Error as exc:
+            logger.warning("Cache increment failed for %s: %s", key, exc)
+            return None
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        if not tags:
+            return 0
+        marks = ",".join("?" for _ in tags)
+        try:
+            with self._transaction() as conn:
+                keys = [r[0] for r in conn.execute(f"SELECT DISTINCT key FROM cache_tags WHERE tag IN ({marks})", tags)]
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+                conn.executemany("DELETE FROM cache_tags WHERE key = ?", [(k,) for k in keys])
+        except sqlite3.Error as exc:
+            logger.warning("Cache invalidation failed for %s: %s", tags, exc)
+            return 0
+        with self._stats_lock:
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM cache_tags")
+
+    def purge_expired(self) -> int:
+        try:
+            with self._transaction() as conn:
+                removed = conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time(),)).rowcount
+                conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache)")
+            return removed
+        except sqlite3.Error as exc:
+            logger.warning("Cache purge failed: %s", exc)
+            return 0
+
+    def expire_all(self):
+        try:
+            with self._transaction() as conn:
+                conn.execute("UPDATE cache SET expires_at = MIN(expires_at, ?)", (time.time(),))
+        except sqlite3.Error as exc:
+            logger.warning("Cache expire failed: %s", exc)
+        self.purge_expired()
+
+    def _enforce_limits(self):
+        unpinned = " AND ".join("key NOT GLOB ?" for _ in PINNED_PREFIXES)
+        patterns = [f"{prefix}*" for prefix in PINNED_PREFIXES]
+        with self._transaction() as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            if count <= self.max_entries and size <= self.max_bytes:
+                return
+            doomed = []
+            rows = conn.execute(f"SELECT key, size FROM cache WHERE {unpinned} ORDER BY accessed_at", patterns)
+            for key, entry_size in rows:
+                if count <= self.max_entries and size <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                count -= 1
+                size -= entry_size
+            conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+            conn.executemany("DELETE FROM cache_tags WHERE key = ?", doomed)
+        with self._stats_lock:
+            self.evictions += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        data = super().stats()
+        try:
+            count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        except sqlite3.Error:
+            count = size = None
+        data.update(entries=count, bytes=size, max_entries=self.max_entries, max_bytes=self.max_bytes, path=self.path)
+        return data
+
+
+class FlightTimeout(TimeoutError):
+    """A caller stopped waiting for a shared call; the call itself carries on."""
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls: one leader runs, the rest share its outcome."""
+
+    def __init__(self):
+        self._calls: Dict[str, "_Flight"] = {}
+        self._tasks: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn, timeout: Optional[float] = None, spawn: Optional[Callable] = None):
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            if timeout is None or spawn is None:
+                self._run(key, flight, fn)
+            else:
+                spawn(lambda: self._run(key, flight, fn))
+        if not flight.done.wait(None if timeout is None else max(timeout, 0)):
+            raise FlightTimeout(f"Gave up waiting for a shared call to {key}")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _run(self, key: str, flight: "_Flight", fn):
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            flight.done.set()
+
+    async def do_async(self, key: str, coro_fn, timeout: Optional[float] = None):
+        task = self._tasks.get(key)
+        if task is not None:
+            with self._lock:
+                self.coalesced += 1
+        else:
+            with self._lock:
+                self.leaders += 1
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda done: self._forget_task(key, done))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), None if timeout is None else max(timeout, 0))
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # the shared call's own error
+            raise FlightTimeout(f"Gave up waiting for a shared call to {key}") from None
+
+    def _forget_task(self, key: str, task):
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter gave up
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls) + len(self._tasks)
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
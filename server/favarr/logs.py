@@ -0,0 +1,307 @@
+"""Tail and live stream of the application log across RotatingFileHandler backups."""
+
+import collections
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+BLOCK_SIZE = 64 * 1024
+BUFFER_RECORDS = int(os.environ.get("FAVARR_LOG_BUFFER", "2000"))
+FOLLOW_INTERVAL = 0.5  # seconds between checks of the log file for other workers' records
+
+# Matches the app formatter: "[2024-01-31 12:00:00] INFO: [Service] message"
+RECORD_RE = re.compile(
+    r"^\[(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (?P<level>[A-Z]+): "
+    r"(?:\[(?P<service>[^\]]+)\] )?(?P<message>.*)$"
+)
+
+
+class LogFilter:
+    """Record predicate built from request parameters; every criterion is optional."""
+
+    def __init__(
+        self,
+        level: Optional[str] = None,
+        service: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        contains: Optional[str] = None,
+    ):
+        self.min_level = _level_number(level) if level else None
+        # Comma-separated tag prefixes, e.g. "Favorites,Favourites"
+        self.services = tuple(p.strip().lower() for p in service.split(",") if p.strip()) if service else None
+        self.since = _normalize_time(since) if since else None
+        self.until = _normalize_time(until, end_of_day=True) if until else None
+        self.contains = contains.lower() if contains else None
+
+    @classmethod
+    def from_args(cls, args) -> "LogFilter":
+        return cls(
+            level=args.get("level"),
+            service=args.get("service"),
+            since=args.get("since"),
+            until=args.get("until"),
+            contains=args.get("q") or args.get("contains"),
+        )
+
+    def matches(self, record: Dict[str, str]) -> bool:
+        if self.min_level is not None and _level_number(record["level"]) < self.min_level:
+            return False
+        if self.services and not (record["service"] or "").lower().startswith(self.services):
+            return False
+        if self.since is not None and record["time"] and record["time"] < self.since:
+            return False
+        if self.until is not None and record["time"] and record["time"] > self.until:
+            return False
+        if self.contains is not None and self.contains not in record["text"].lower():
+            return False
+        return True
+
+    def older_than_range(self, record: Dict[str, str]) -> bool:
+        """True once a record predates since; everything further back does too."""
+        return self.since is not None and bool(record["time"]) and record["time"] < self.since
+
+
+def _level_number(name: str) -> int:
+    value = logging.getLevelName(str(name).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return value
+
+
+def _normalize_time(value: str, end_of_day: bool = False) -> str:
+    """ISO 8601 time as local log time; with end_of_day a bare date means the end of that day."""
+    text = value.strip()
+    try:
+        moment = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith(("Z", "z")) else text)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    if end_of_day and re.match(r"^\d{4}-\d{2}-\d{2}$", text):
+        moment += timedelta(days=1, seconds=-1)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_record(text: str) -> Dict[str, str]:
+    """Split a formatted record into time, level, service and message."""
+    first, _, rest = text.partition("\n")
+    match = RECORD_RE.match(first)
+    if not match:
+        return {"time": "", "level": "INFO", "service": None, "message": text, "text": text}
+    message = match.group("message") + ("\n" + rest if rest else "")
+    return {
+        "time": match.group("time"),
+        "level": match.group("level"),
+        "service": match.group("service"),
+        "message": message,
+        "text": text,
+    }
+
+
+def log_files(path: str, backup_count: int) -> List[str]:
+    """The active log and its backups, newest first, that currently exist."""
+    candidates = [path] + [f"{path}.{i}" for i in range(1, backup_count + 1)]
+    return [p for p in candidates if os.path.exists(p)]
+
+
+def _reverse_lines(f, end: int, block_size: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (start offset, line) from end backwards, reading block_size at a time."""
+    pos = end
+    partial = b""
+    while pos > 0:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        chunk = f.read(size) + partial
+        parts = chunk.split(b"\n")
+        partial = parts[0]  # may continue into the previous block
+        offset = pos + len(chunk)
+        for part in reversed(parts[1:]):
+            offset -= len(part)
+            if part:
+                yield offset, part
+            offset -= 1
+    if partial:
+        yield 0, partial
+
+
+def _reverse_records(path: str, end: int, block_size: int) -> Iterator[Tuple[int, str]]:
+    """Yield (start offset, record text) newest first; tracebacks stay with their record."""
+    continuation: List[str] = []
+    with open(path, "rb") as f:
+        for offset, raw in _reverse_lines(f, end, block_size):
+            line = raw.decode("utf-8", errors="ignore").rstrip("\r")
+            if RECORD_RE.match(line):
+                yield offset, "\n".join([line] + continuation[::-1])
+                continuation = []
+            else:
+                continuation.append(line)
+    if continuation:
+        # Orphaned lines at the top of a file, left by rotation mid-record
+        yield 0, "\n".join(continuation[::-1])
+
+
+def _parse_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        inode, offset = cursor.split("-", 1)
+        return int(inode), int(offset)
+    except ValueError:
+        raise ValueError("Invalid log cursor") from None
+
+
+def tail(
+    paths: List[str],
+    limit: int = 200,
+    log_filter: Optional[LogFilter] = None,
+    cursor: Optional[str] = None,
+    block_size: int = BLOCK_SIZE,
+) -> Dict[str, object]:
+    """Return up to limit matching records, oldest first, ending at cursor (or the end), and the cursor further back."""
+    log_filter = log_filter or LogFilter()
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # rotated away between listing and reading
+        files.append((path, stat.st_ino, stat.st_size))
+
+    # A cursor is "<inode>-<offset>"; rotation renames files without changing their inode.
+    start = 0
+    if cursor:
+        inode, offset = _parse_cursor(cursor)
+        start = next((i for i, (_, ino, _) in enumerate(files) if ino == inode), len(files))
+        if start < len(files):
+            path, ino, _ = files[start]
+            files[start] = (path, ino, offset)
+
+    records: List[str] = []
+    for path, inode, end in files[start:]:
+        for offset, text in _reverse_records(path, end, block_size):
+            record = parse_record(text)
+            if log_filter.older_than_range(record):
+                return {"lines": records[::-1], "cursor": None}
+            if not log_filter.matches(record):
+                continue
+            records.append(text)
+            if len(records) >= limit:
+                return {"lines": records[::-1], "cursor": f"{inode}-{offset}"}
+    return {"lines": records[::-1], "cursor": None}
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last capacity formatted records, numbered, for live followers."""
+
+    def __init__(self, capacity: int = BUFFER_RECORDS, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = collections.deque(maxlen=capacity)  # (seq, text)
+        self.seq = 0
+        self._cond = threading.Condition()
+        # Texts written by this process, not yet seen in the file, oldest first. Bounded:
+        # a line that never reaches the file (filtered, lost to rotation) is
+        # eventually dropped, at worst showing its record twice.
+        self._own: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._own_limit = capacity
+        self._follower = {"pid": None, "thread": None, "path": None}
+
+    def emit(self, record):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._cond:
+            if self._follower["pid"] == os.getpid():
+                self._own[text] = self._own.get(text, 0) + 1  # the follower will meet this line in the file
+                self._own.move_to_end(text)
+                while len(self._own) > self._own_limit:
+                    self._own.popitem(last=False)
+            self._append(text)
+
+    def _append(self, text: str):
+        self.seq += 1
+        self.records.append((self.seq, text))
+        self._cond.notify_all()
+
+    def append_external(self, text: str):
+        with self._cond:
+            count = self._own.get(text)
+            if count:
+                if count > 1:
+                    self._own[text] = count - 1
+                else:
+                    del self._own[text]
+                return
+            self._append(text)
+
+    def latest(self) -> int:
+        with self._cond:
+            return self.seq
+
+    def after(self, seq: int) -> List[Tuple[int, str]]:
+        """Buffered records numbered above seq, oldest first."""
+        with self._cond:
+            return [(n, text) for n, text in self.records if n > seq]
+
+    def wait(self, seq: int, timeout: float) -> List[Tuple[int, str]]:
+        """Records after seq, waiting up to timeout for one to arrive."""
+        with self._cond:
+            if self.seq <= seq:
+                self._cond.wait(timeout)
+        return self.after(seq)
+
+    def follow(self, path: str):
+        """Start (once per process) the thread adding other workers' records from path."""
+        with self._cond:
+            if self._follower["pid"] == os.getpid() and self._follower["thread"].is_alive():
+                return
+            thread = threading.Thread(target=self._follow_file, args=(path,), name="favarr-log-follow", daemon=True)
+            self._follower.update(pid=os.getpid(), thread=thread, path=path)
+            # Drop counts inherited from a parent process; its lines are already in the file.
+            self._own.clear()
+        thread.start()
+
+    def _follow_file(self, path: str):
+        inode, offset, partial = None, 0, b""
+        record: List[str] = []  # lines of the newest record, which may still be being written
+        while True:
+            try:
+                stat = os.stat(path)
+                if stat.st_ino != inode or stat.st_size < offset:
+                    # First look, or the file was rotated: start at the end of the new file
+                    # once, then from its beginning after later rotations.
+                    offset = stat.st_size if inode is None else 0
+                    inode, partial = stat.st_ino, b""
+                    record = self._flush(record)
+                if stat.st_size > offset:
+                    with open(path, "rb") as f:
+                        f.seek(offset)
+                        data = f.read(stat.st_size - offset)
+                    offset += len(data)
+                    lines = (partial + data).split(b"\n")
+                    partial = lines.pop()
+                    record = self._add_lines([line.decode("utf-8", errors="ignore").rstrip("\r") for line in lines], record)
+                else:
+                    record = self._flush(record)  # a quiet tick: the record is complete
+            except OSError:
+                pass  # mid-rotation; try again next tick
+            time.sleep(FOLLOW_INTERVAL)
+
+    def _add_lines(self, lines: List[str], record: List[str]) -> List[str]:
+        """Append records completed by lines; returns the still-open last record."""
+        for line in lines:
+            if RECORD_RE.match(line) and record:
+                self.append_external("\n".join(record))
+                record = []
+            record.append(line)
+        return record
+
+    def _flush(self, record: List[str]) -> List[str]:
+        if record:
+            self.append_external("\n".join(record))
+        return []
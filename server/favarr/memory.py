@@ -0,0 +1,213 @@
+"""tracemalloc snapshots and in-process cache sizes; see docs/diagnostics.md."""
+
+import gc
+import os
+import re
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from .aio import async_pool_state
+from .services import _breakers, _latency, _limiters, get_response_cache, inflight_reads, pool_registry
+
+DEFAULT_FRAMES = int(os.environ.get("FAVARR_TRACEMALLOC_FRAMES", "1"))
+MAX_SNAPSHOTS = int(os.environ.get("FAVARR_MAX_MEMORY_SNAPSHOTS", "10"))
+TRACING_TTL = 24 * 3600  # tracing switches itself off a day after the last start
+SYNC_POLL_SECONDS = 2.0
+GROUPINGS = ("lineno", "filename")
+
+# Shared switch: every worker follows it on its next request, at most every SYNC_POLL_SECONDS.
+TRACING_KEY = "memory:tracing"
+SNAPSHOT_NAME = re.compile(r"^\d+-\d{8}-\d{6}\.\d{3}\.snapshot$")
+
+_state = {"directory": None, "checked": 0.0, "started_here": False}
+
+
+def _filters() -> List[tracemalloc.Filter]:
+    return [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+
+
+def start(frames: int = DEFAULT_FRAMES) -> Dict[str, Any]:
+    """Turn tracing on here now and in the other workers with their next request."""
+    frames = max(1, min(int(frames), 50))
+    get_response_cache().set(TRACING_KEY, str(frames).encode(), TRACING_TTL)
+    _apply(frames)
+    return status()
+
+
+def stop() -> Dict[str, Any]:
+    get_response_cache().set(TRACING_KEY, b"0", 1)
+    _apply(0)
+    return status()
+
+
+def _apply(frames: int):
+    if frames and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _state["started_here"] = True
+    elif not frames and tracemalloc.is_tracing() and _state["started_here"]:
+        tracemalloc.stop()  # leave tracing started by PYTHONTRACEMALLOC alone
+        _state["started_here"] = False
+    _state["checked"] = time.monotonic()
+
+
+def _sync():
+    if time.monotonic() - _state["checked"] < SYNC_POLL_SECONDS:
+        return
+    try:
+        raw = get_response_cache().peek(TRACING_KEY)
+    except Exception:
+        return
+    _apply(int(raw) if raw else 0)
+
+
+def status() -> Dict[str, Any]:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "pid": os.getpid(),
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+        "rss_bytes": _rss_bytes(),
+    }
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # high-water mark, not current
+
+
+def take_snapshot() -> Dict[str, Any]:
+    """Dump a snapshot of this worker's traced allocations; ValueError if not tracing here."""
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc is not running in this worker; start it first")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_filters())
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{now % 1:.3f}"[1:]
+    name = f"{os.getpid()}-{stamp}.snapshot"
+    snapshot.dump(os.path.join(_state["directory"], name))
+    _prune()
+    return {"name": name, **status()}
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    """Snapshot dumps on disk, newest first."""
+    directory = _state["directory"]
+    entries = []
+    for name in os.listdir(directory):
+        if not SNAPSHOT_NAME.match(name):
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        entries.append({"name": name, "pid": int(name.split("-", 1)[0]), "size": stat.st_size,
+                        "created_at": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["created_at"], reverse=True)
+
+
+def _prune():
+    for entry in list_snapshots()[MAX_SNAPSHOTS:]:
+        try:
+            os.remove(os.path.join(_state["directory"], entry["name"]))
+        except OSError:
+            pass
+
+
+def _load(name: str) -> tracemalloc.Snapshot:
+    path = os.path.join(_state["directory"], name)
+    if not SNAPSHOT_NAME.match(name) or not os.path.exists(path):
+        raise LookupError(f"Snapshot not found: {name}")
+    return tracemalloc.Snapshot.load(path)
+
+
+def _check_grouping(group_by: str):
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+
+
+def _frame(stat, group_by: str) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {"file": frame.filename, "line": frame.lineno if group_by == "lineno" else None}
+
+
+def top(name: Optional[str] = None, group_by: str = "lineno", limit: int = 25) -> List[Dict[str, Any]]:
+    """Largest allocation sites in a dumped snapshot, or in a fresh one of this worker."""
+    _check_grouping(group_by)
+    if name:
+        snapshot = _load(name)
+    elif tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot().filter_traces(_filters())
+    else:
+        raise ValueError("tracemalloc is not running in this worker; start it first")
+    return [
+        {**_frame(stat, group_by), "size": stat.size, "count": stat.count}
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def compare(old: str, new: Optional[str] = None, group_by: str = "lineno", limit: int = 25) -> List[Dict[str, Any]]:
+    """Allocation sites that grew most from snapshot old to new (default: now, in this worker)."""
+    _check_grouping(group_by)
+    previous = _load(old)
+    old_pid = int(old.split("-", 1)[0])
+    if new:
+        if SNAPSHOT_NAME.match(new) and int(new.split("-", 1)[0]) != old_pid:
+            raise ValueError("Snapshots come from different workers and cannot be compared")
+        current = _load(new)
+    elif old_pid != os.getpid():
+        raise ValueError(f"Snapshot {old} was taken by worker {old_pid}; pass a second snapshot from it")
+    elif tracemalloc.is_tracing():
+        current = tracemalloc.take_snapshot().filter_traces(_filters())
+    else:
+        raise ValueError("tracemalloc is not running in this worker; start it first")
+    stats = current.compare_to(previous, group_by)
+    return [
+        {**_frame(stat, group_by), "size": stat.size, "size_diff": stat.size_diff, "count": stat.count,
+         "count_diff": stat.count_diff}
+        for stat in stats[:limit]
+    ]
+
+
+def sizes() -> Dict[str, Any]:
+    """Entry counts of this worker's caches, pools and per-server state."""
+    pools = pool_registry.snapshot()
+    by_server = pools["by_server"].values()
+    return {
+        "response_cache": get_response_cache().stats(),
+        "connection_pools": {
+            "pools": pools["pools"],
+            "max_pools": pools["max_pools"],
+            "capacity": sum(p["size"] for p in by_server),  # connections the pools may hold
+            "in_use": sum(p["in_use"] for p in by_server),
+            "idle": sum(p["idle"] for p in by_server),
+        },
+        "async_pools": len(async_pool_state()),
+        "inflight_reads": inflight_reads.stats()["in_flight"],
+        "latency_trackers": len(_latency),
+        "circuit_breakers": len(_breakers),
+        "limiters": len(_limiters),
+        "gc_objects": len(gc.get_objects()),
+    }
+
+
+def init_app(app, directory: str):
+    """Follow the shared tracing switch on every request."""
+    os.makedirs(directory, exist_ok=True)
+    _state["directory"] = directory
+    app.before_request(_sync)
@@ -0,0 +1,381 @@
+"""Prometheus metrics, merged from every worker's snapshot in the shared cache."""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from flask import g, request
+
+from .aio import async_pool_state
+from .models import StatsSnapshot
+from .services import get_response_cache, inflight_reads, limiter_states, on_upstream_call, pool_registry, _server_key
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+PUBLISH_INTERVAL = 15  # seconds between snapshots published to the shared cache
+SNAPSHOT_TTL = PUBLISH_INTERVAL * 3  # a worker that stops publishing drops out after this
+MAX_WORKER_SLOTS = 32
+
+logger = logging.getLogger(__name__)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[list]:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values: Dict[tuple, list] = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[list]:
+        with self._lock:
+            return [[list(k), {"counts": list(v[0]), "sum": v[1]}] for k, v in self._values.items()]
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+_metrics: Dict[str, Any] = {}
+_collectors: List[Callable[[], Iterable[dict]]] = []
+_shared_collectors: List[Callable[[], Iterable[dict]]] = []
+_slot = {"index": None, "pid": None}
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero; the parent's counts are its own to publish.
+    for metric in _metrics.values():
+        metric.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def counter(name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+    return _metrics.setdefault(name, Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+    return _metrics.setdefault(name, Histogram(name, help_text, labels, buckets))
+
+
+def collector(fn: Callable[[], Iterable[dict]]):
+    """Register fn() -> families read from this process at snapshot time; summed across workers."""
+    _collectors.append(fn)
+    return fn
+
+
+def shared_collector(fn: Callable[[], Iterable[dict]]):
+    """Register fn() -> deployment-wide families, read once per scrape by the answering worker."""
+    _shared_collectors.append(fn)
+    return fn
+
+
+def family(name: str, kind: str, help_text: str, labels: Tuple[str, ...], samples: Iterable[tuple]) -> dict:
+    """A collected metric: samples are (label values tuple, value)."""
+    return {
+        "name": name,
+        "type": kind,
+        "help": help_text,
+        "labels": list(labels),
+        "samples": [[list(values), value] for values, value in samples],
+    }
+
+
+# ---------- Recording ----------
+
+upstream_seconds = histogram(
+    "favarr_upstream_request_duration_seconds",
+    "Upstream request latency by server and endpoint class.",
+    ("server", "server_type", "endpoint"),
+)
+upstream_errors = counter(
+    "favarr_upstream_errors_total",
+    "Failed upstream requests by server, endpoint class and kind.",
+    ("server", "server_type", "endpoint", "kind"),
+)
+http_seconds = histogram(
+    "favarr_http_request_duration_seconds",
+    "API request latency by route, method and status.",
+    ("route", "method", "status"),
+)
+job_seconds = histogram(
+    "favarr_job_duration_seconds",
+    "Background job and collection durations.",
+    ("job", "outcome"),
+    buckets=JOB_BUCKETS,
+)
+
+
+def _error_kind(status: Optional[int], error) -> Optional[str]:
+    if status is not None and status >= 400:
+        return f"http_{status // 100}xx"
+    if error is None:
+        return None
+    if isinstance(error, (requests.exceptions.Timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(error, (requests.exceptions.ConnectionError, ConnectionError)):
+        return "connection"
+    if "Timeout" in type(error).__name__:
+        return "timeout"
+    if "Connect" in type(error).__name__:
+        return "connection"
+    return "error"
+
+
+@on_upstream_call
+def _record_upstream(server, endpoint_cls, seconds, status, error):
+    labels = (str(_server_key(server)), getattr(server, "server_type", "") or "", endpoint_cls)
+    upstream_seconds.observe(seconds, *labels)
+    kind = _error_kind(status, error)
+    if kind:
+        upstream_errors.inc(*labels, kind)
+
+
+def observe_job(name: str, seconds: float, ok: bool = True):
+    job_seconds.observe(seconds, name, "success" if ok else "failure")
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_seconds.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+    return response
+
+
+def init_app(app):
+    """Time every request; register before admission control so queueing time counts."""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+
+
+# ---------- Collectors ----------
+
+@collector
+def _pool_metrics():
+    pools = pool_registry.snapshot()["by_server"]
+    yield family("favarr_pool_size", "gauge", "Connection pool size per server.", ("server",),
+                 [((k,), p["size"]) for k, p in pools.items()])
+    yield family("favarr_pool_in_use", "gauge", "Pooled connections checked out per server.", ("server",),
+                 [((k,), p["in_use"]) for k, p in pools.items()])
+    yield family("favarr_pool_waits_total", "counter", "Checkouts that found the pool exhausted.", ("server",),
+                 [((k,), p["waits"]) for k, p in pools.items()])
+    async_pools = async_pool_state()
+    yield family("favarr_async_pool_requests_total", "counter", "Requests through the async pools.", ("server",),
+                 [((k,), p["requests"]) for k, p in async_pools.items()])
+
+
+@collector
+def _limiter_metrics():
+    limiters = limiter_states()
+    yield family("favarr_upstream_in_flight", "gauge", "Upstream requests in flight per server.", ("server",),
+                 [((k,), s["in_flight"]) for k, s in limiters.items()])
+    yield family("favarr_upstream_queued", "gauge", "Upstream requests waiting for a slot.", ("server",),
+                 [((k,), s["queued"]) for k, s in limiters.items()])
+    yield family("favarr_upstream_rejected_total", "counter", "Upstream requests refused by the limiter.",
+                 ("server",), [((k,), s["rejected"]) for k, s in limiters.items()])
+
+
+@collector
+def _cache_metrics():
+    stats = get_response_cache().stats()
+    yield family("favarr_cache_requests_total", "counter", "Response cache lookups by result.", ("result",),
+                 [(("hit",), stats["hits"]), (("miss",), stats["misses"])])
+    yield family("favarr_cache_evictions_total", "counter", "Response cache evictions.", (),
+                 [((), stats["evictions"])])
+    coalescing = inflight_reads.stats()
+    yield family("favarr_coalesced_reads_total", "counter", "Reads that joined an identical in-flight read.", (),
+                 [((), coalescing.get("coalesced", 0))])
+
+
+@shared_collector
+def _snapshot_metrics():
+    snapshot = (StatsSnapshot.query
+                .filter_by(collection_status="completed")
+                .order_by(StatsSnapshot.created_at.desc())
+                .first())
+    if not snapshot:
+        return
+    data = snapshot.to_dict()
+    yield family("favarr_stats_servers", "gauge", "Servers in the latest stats snapshot.", (),
+                 [((), data["servers_total"])])
+    yield family("favarr_stats_users", "gauge", "Users in the latest stats snapshot.", (),
+                 [((), data["users_total"])])
+    yield family("favarr_stats_favorites", "gauge", "Favourites in the latest stats snapshot.", (),
+                 [((), data["favorites_total"])])
+    yield family("favarr_stats_favorites_by_type", "gauge", "Favourites by item type in the latest stats snapshot.",
+                 ("type",), [((t,), n) for t, n in data["favorites_by_type"].items()])
+    yield family("favarr_stats_snapshot_timestamp_seconds", "gauge", "When the latest stats snapshot was taken.", (),
+                 [((), snapshot.created_at.replace(tzinfo=timezone.utc).timestamp() if snapshot.created_at else 0)])
+
+
+# ---------- Snapshots and aggregation ----------
+
+def snapshot() -> Dict[str, dict]:
+    """This process's metrics as JSON-friendly families keyed by name."""
+    families = {}
+    for metric in list(_metrics.values()):
+        families[metric.name] = {
+            "name": metric.name,
+            "type": metric.kind,
+            "help": metric.help,
+            "labels": list(metric.labels),
+            "buckets": list(getattr(metric, "buckets", ())),
+            "samples": metric.samples(),
+        }
+    for fam in _collect(_collectors):
+        families[fam["name"]] = fam
+    return families
+
+
+def _collect(collectors) -> List[dict]:
+    families = []
+    for fn in collectors:
+        try:
+            families.extend(fn())
+        except Exception:
+            logger.warning("Metrics collector %s failed", fn.__name__, exc_info=True)
+    return families
+
+
+def _slot_key(index: int) -> str:
+    return f"metrics:slot:{index}"
+
+
+def publish(cache):
+    """Store this worker's snapshot in the shared cache, claiming a slot if needed."""
+    pid = str(os.getpid()).encode()
+    if _slot["pid"] != os.getpid() or cache.peek(_slot_key(_slot["index"])) != pid:
+        _slot.update(index=None, pid=os.getpid())
+        for index in range(MAX_WORKER_SLOTS):
+            if cache.add(_slot_key(index), pid, SNAPSHOT_TTL):
+                _slot["index"] = index
+                break
+        else:
+            return  # more workers than slots; this one is left out
+    cache.set(_slot_key(_slot["index"]), pid, SNAPSHOT_TTL)
+    cache.set(f"metrics:worker:{os.getpid()}", json.dumps(snapshot()).encode(), SNAPSHOT_TTL)
+
+
+def _worker_snapshots(cache) -> List[Dict[str, dict]]:
+    snapshots = []
+    for index in range(MAX_WORKER_SLOTS):
+        pid = cache.peek(_slot_key(index))
+        if not pid:
+            continue
+        raw = cache.peek(f"metrics:worker:{pid.decode()}")
+        if raw:
+            try:
+                snapshots.append(json.loads(raw))
+            except ValueError:
+                continue
+    return snapshots
+
+
+def _merge(snapshots: List[Dict[str, dict]]) -> Dict[str, dict]:
+    merged: Dict[str, dict] = {}
+    for families in snapshots:
+        for name, fam in families.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**fam, "samples": {}}
+            for values, value in fam["samples"]:
+                key = tuple(values)
+                current = target["samples"].get(key)
+                if isinstance(value, dict):
+                    if current is None:
+                        current = target["samples"][key] = {"counts": [0] * len(value["counts"]), "sum": 0.0}
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+                else:
+                    target["samples"][key] = (current or 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: List[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(cache) -> str:
+    """Prometheus exposition text for all live workers plus shared collectors."""
+    publish(cache)
+    merged = _merge(_worker_snapshots(cache) or [snapshot()])
+    for fam in _collect(_shared_collectors):
+        merged[fam["name"]] = {**fam, "samples": {tuple(v): x for v, x in fam["samples"]}}
+
+    lines = []
+    for name in sorted(merged):
+        fam = merged[name]
+        lines.append(f"# HELP {name} {fam['help']}")
+        lines.append(f"# TYPE {name} {fam['type']}")
+        for values, value in sorted(fam["samples"].items()):
+            if fam["type"] == "histogram":
+                cumulative = 0
+                bounds = [_format_number(b) for b in fam["buckets"]] + ["+Inf"]
+                for bound, count in zip(bounds, value["counts"]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_label_text(fam['labels'], values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(fam['labels'], values)} {_format_number(value['sum'])}")
+                lines.append(f"{name}_count{_label_text(fam['labels'], values)} {cumulative}")
+            else:
+                lines.append(f"{name}{_label_text(fam['labels'], values)} {_format_number(value)}")
+    return "\n".join(lines) + "\n"
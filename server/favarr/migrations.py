@@ -0,0 +1,54 @@
+"""Additive schema upgrades and data moves for existing SQLite databases."""
+
+import json
+
+from sqlalchemy import inspect, text
+
+from .extensions import db
+
+
+def upgrade_schema():
+    """Add any model columns and indexes missing from existing tables. Returns added names."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            added.append(f"{table.name}.{column.name}")
+        # Indexes on added columns (e.g. emby_layout_templates.content_hash) are not created by ALTER TABLE
+        indexed = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in indexed:
+                continue
+            columns = ", ".join(f'"{column.name}"' for column in index.columns)
+            unique = "UNIQUE " if index.unique else ""
+            db.session.execute(
+                text(f'CREATE {unique}INDEX IF NOT EXISTS "{index.name}" ON "{table.name}" ({columns})')
+            )
+            added.append(f"index {index.name}")
+    db.session.commit()
+    return added
+
+
+def move_layout_blobs():
+    """Move inline template JSON into content-addressed layout blobs. Returns the count moved."""
+    from .models import EmbyLayoutTemplate, LayoutBlob
+
+    moved = 0
+    for template in EmbyLayoutTemplate.query.filter(EmbyLayoutTemplate.json_blob != "").all():
+        try:
+            payload = json.loads(template.json_blob)
+        except json.JSONDecodeError:
+            continue  # left inline; payload() reads it as an empty layout
+        template.content_hash = LayoutBlob.store(payload).content_hash
+        template.json_blob = ""
+        moved += 1
+    db.session.commit()
+    return moved
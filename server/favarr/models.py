@@ -1,4 +1,8 @@
+import hashlib
 import json
+import zlib
+
+from sqlalchemy.exc import IntegrityError
 
 from .extensions import db
 
@@ -14,6 +18,10 @@ class Server(db.Model):
     token = db.Column(db.String(500), nullable=True)  # For Plex
     enabled = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Outbound limits; NULL falls back to the defaults in favarr.services.
+    max_concurrency = db.Column(db.Integer, nullable=True)
+    rate_limit = db.Column(db.Float, nullable=True)  # requests per second, 0 = unlimited
+    rate_burst = db.Column(db.Integer, nullable=True)
 
     def to_dict(self, include_sensitive=False):
         data = {
@@ -23,6 +31,9 @@ class Server(db.Model):
             "url": self.url,
             "enabled": self.enabled,
             "has_credentials": bool(self.api_key or self.token),
+            "max_concurrency": self.max_concurrency,
+            "rate_limit": self.rate_limit,
+            "rate_burst": self.rate_burst,
         }
         if include_sensitive:
             data["api_key"] = self.api_key
@@ -89,6 +100,60 @@ class StatsSnapshot(db.Model):
         }
 
 
+class LayoutBlob(db.Model):
+    """Layout JSON stored once per distinct content, compressed when large."""
+
+    __tablename__ = "layout_blobs"
+
+    COMPRESS_MIN_BYTES = 1024
+
+    content_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the canonical JSON
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))  # loaded only when the JSON is needed
+    compressed = db.Column(db.Boolean, default=False)
+    size = db.Column(db.Integer, default=0)  # canonical JSON bytes
+    stored_size = db.Column(db.Integer, default=0)
+    pref_ids = db.Column(db.Text, default="[]")  # JSON string
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    @staticmethod
+    def canonical(payload):
+        return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def hash_payload(payload):
+        """Hash of a layout that ignores key order and whitespace."""
+        return hashlib.sha256(LayoutBlob.canonical(payload)).hexdigest()
+
+    @classmethod
+    def store(cls, payload):
+        """Return the blob for payload, inserting it if it is new."""
+        raw = cls.canonical(payload)
+        content_hash = hashlib.sha256(raw).hexdigest()
+        blob = db.session.get(cls, content_hash)
+        if blob is not None:
+            return blob
+        compressed = len(raw) >= cls.COMPRESS_MIN_BYTES
+        data = zlib.compress(raw) if compressed else raw
+        blob = cls(
+            content_hash=content_hash,
+            data=data,
+            compressed=compressed,
+            size=len(raw),
+            stored_size=len(data),
+            pref_ids=json.dumps([str(k) for k in payload] if isinstance(payload, dict) else []),
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(blob)
+        except IntegrityError:
+            blob = db.session.get(cls, content_hash, populate_existing=True)
+        return blob
+
+    def payload(self):
+        raw = zlib.decompress(self.data) if self.compressed else self.data
+        return json.loads(raw)
+
+
 class EmbyLayoutTemplate(db.Model):
     """Template storage for Emby home-screen layouts."""
 
@@ -97,19 +162,142 @@ class EmbyLayoutTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    json_blob = db.Column(db.Text, nullable=False)
+    json_blob = db.Column(db.Text, nullable=False, default="")  # legacy inline JSON; moved to layout_blobs
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # LayoutBlob holding the JSON
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    blob = db.relationship(
+        LayoutBlob,
+        primaryjoin="foreign(EmbyLayoutTemplate.content_hash) == LayoutBlob.content_hash",
+        lazy="joined",
+        viewonly=True,
+    )
+
+    hash_payload = staticmethod(LayoutBlob.hash_payload)
+
+    def payload(self):
+        if self.blob is not None:
+            return self.blob.payload()
+        try:
+            return json.loads(self.json_blob) if self.json_blob else {}
+        except json.JSONDecodeError:
+            return {}
+
     def to_dict(self, include_json=True):
         data = {
             "id": self.id,
             "name": self.name,
             "description": self.description,
+            "content_hash": self.content_hash,
+            "size": self.blob.size if self.blob else len(self.json_blob or ""),
+            "pref_ids": json.loads(self.blob.pref_ids) if self.blob else [],
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
         if include_json:
-            try:
-                data["json_blob"] = json.loads(self.json_blob) if self.json_blob else {}
-            except json.JSONDecodeError:
-                data["json_blob"] = {}
+            data["json_blob"] = self.payload()
+        return data
+
+
+class ServerHealthSample(db.Model):
+    """One background health probe result; kept as a fixed-size ring per server."""
+
+    __tablename__ = "server_health_samples"
+
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+    ok = db.Column(db.Boolean, nullable=False)
+    latency_ms = db.Column(db.Float, nullable=True)  # NULL when the probe never reached the server
+    error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "server_id": self.server_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "ok": self.ok,
+            "latency_ms": self.latency_ms,
+            "error": self.error,
+        }
+
+
+class BulkOperation(db.Model):
+    """A long-running bulk job (e.g. applying a layout to many users) and its progress."""
+
+    __tablename__ = "bulk_operations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    kind = db.Column(db.String(50), nullable=False)  # layout_apply
+    server_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), default="pending")  # pending, running, completed, failed
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    message = db.Column(db.Text, default="")
+    total = db.Column(db.Integer, default=0)
+    succeeded = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    params = db.Column(db.Text, default="{}")  # JSON string
+    results = db.Column(db.Text, default="[]")  # JSON string
+    duration_seconds = db.Column(db.Float, default=0)
+
+    def to_dict(self, include_results=True):
+        data = {
+            "id": self.id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "kind": self.kind,
+            "server_id": self.server_id,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "params": json.loads(self.params) if self.params else {},
+            "duration_seconds": self.duration_seconds,
+        }
+        if include_results:
+            data["results"] = json.loads(self.results) if self.results else []
+        return data
+
+
+class SlowRequest(db.Model):
+    """A request that took longer than the slow threshold, with its upstream call trace."""
+
+    __tablename__ = "slow_requests"
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+    method = db.Column(db.String(10), nullable=False)
+    route = db.Column(db.String(255), nullable=False, index=True)  # URL rule, e.g. /api/servers/<int:server_id>/items
+    path = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Integer, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=False)
+    params = db.Column(db.Text, default="{}")  # JSON string, credentials scrubbed
+    upstream_calls = db.Column(db.Integer, default=0)
+    upstream_ms = db.Column(db.Float, default=0)
+    db_queries = db.Column(db.Integer, default=0)
+    db_ms = db.Column(db.Float, default=0)
+    cache_hits = db.Column(db.Integer, default=0)
+    cache_misses = db.Column(db.Integer, default=0)
+    calls = db.Column(db.Text, default="[]")  # JSON string, upstream calls in issue order
+
+    def to_dict(self, include_calls=True):
+        data = {
+            "id": self.id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "params": json.loads(self.params) if self.params else {},
+            "upstream_calls": self.upstream_calls,
+            "upstream_ms": self.upstream_ms,
+            "db_queries": self.db_queries,
+            "db_ms": self.db_ms,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+        if include_calls:
+            data["calls"] = json.loads(self.calls) if self.calls else []
         return data
@@ -0,0 +1,218 @@
+"""On-demand CPU profiles of live requests; see docs/diagnostics.md."""
+
+import collections
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+from .admin import is_admin_request
+from .services import get_response_cache
+
+MODES = ("cprofile", "sample")
+MAX_PROFILES = int(os.environ.get("FAVARR_MAX_PROFILES", "50"))
+MAX_ARMED_REQUESTS = 100
+ARM_TTL = 3600  # armed routes expire after an hour if their requests never come
+ARM_POLL_SECONDS = 2.0
+SAMPLE_INTERVAL = 0.005
+
+# Arming lives in the shared cache so every worker sees it: the route list,
+# and a countdown per route that workers claim with incr(-1).
+ROUTES_KEY = "profile:routes"
+
+logger = logging.getLogger(__name__)
+
+_state = {"directory": None}
+_armed_memo = {"routes": {}, "checked": 0.0}
+
+
+def _count_key(route: str) -> str:
+    return f"profile:count:{route}"
+
+
+def armed_routes() -> Dict[str, str]:
+    """Armed route rules and their profiler mode, as stored in the shared cache."""
+    raw = get_response_cache().peek(ROUTES_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def arm(route: str, count: int = 1, mode: str = "cprofile") -> Dict[str, object]:
+    """Profile the next count requests to the route rule with the given profiler."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiler: {mode}")
+    count = max(1, min(int(count), MAX_ARMED_REQUESTS))
+    cache = get_response_cache()
+    routes = armed_routes()
+    routes[route] = mode
+    cache.set(_count_key(route), str(count).encode(), ARM_TTL)
+    cache.set(ROUTES_KEY, json.dumps(routes).encode(), ARM_TTL)
+    _armed_memo["checked"] = 0.0
+    return {"route": route, "count": count, "mode": mode}
+
+
+def disarm(route: Optional[str] = None):
+    """Stop profiling one route, or every route when route is None."""
+    cache = get_response_cache()
+    routes = armed_routes()
+    for name in ([route] if route else list(routes)):
+        routes.pop(name, None)
+        cache.set(_count_key(name), b"0", 1)
+    cache.set(ROUTES_KEY, json.dumps(routes).encode(), ARM_TTL)
+    _armed_memo["checked"] = 0.0
+
+
+def _armed_mode(route: str) -> Optional[str]:
+    """The profiler to run for this request to route, claiming one armed slot."""
+    now = time.monotonic()
+    if now - _armed_memo["checked"] >= ARM_POLL_SECONDS:
+        try:
+            _armed_memo["routes"] = armed_routes()
+        except Exception:
+            _armed_memo["routes"] = {}
+        _armed_memo["checked"] = now
+    mode = _armed_memo["routes"].get(route)
+    if mode is None:
+        return None
+    left = get_response_cache().incr(_count_key(route), -1, ARM_TTL)
+    if left is None:
+        return None  # cache unavailable; skip this one rather than guess
+    if left >= 0:
+        return mode
+    disarm(route)  # countdown used up (possibly by another worker)
+    return None
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: collections.Counter = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="favarr-profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start():
+    mode = None
+    requested = request.headers.get("X-Profile")
+    if requested and is_admin_request():
+        mode = requested if requested in MODES else "cprofile"
+    elif request.url_rule is not None:
+        mode = _armed_mode(request.url_rule.rule)
+    if mode is None:
+        return
+    if mode == "sample":
+        profiler = StackSampler(threading.get_ident())
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time per process; sample instead
+            profiler, mode = StackSampler(threading.get_ident()), "sample"
+            profiler.start()
+    g.profile = (mode, profiler, time.time())
+
+
+def _finish(response):
+    active = g.pop("profile", None)
+    if active is None:
+        return response
+    mode, profiler, started = active
+    if mode == "sample":
+        profiler.stop()
+    else:
+        profiler.disable()
+    route = request.url_rule.rule if request.url_rule else request.path
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started)) + f"{started % 1:.3f}"[1:]
+    name = f"{stamp}-{request.method}-{slug}-{os.getpid()}-{threading.get_ident() % 10000}"
+    name += ".folded" if mode == "sample" else ".prof"
+    try:
+        path = os.path.join(_state["directory"], name)
+        if mode == "sample":
+            profiler.dump(path)
+        else:
+            profiler.dump_stats(path)
+        _prune()
+        response.headers["X-Profile"] = name
+    except OSError as exc:
+        logger.warning("Could not write profile %s: %s", name, exc)
+    return response
+
+
+def _abandon(exc=None):
+    # The response never reached after_request (e.g. a streaming error); stop without writing.
+    active = g.pop("profile", None)
+    if active is not None:
+        mode, profiler, _ = active
+        if mode == "sample":
+            profiler.stop()
+        else:
+            profiler.disable()
+
+
+def list_profiles() -> List[Dict[str, object]]:
+    """Profile dumps on disk, newest first."""
+    directory = _state["directory"]
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith((".prof", ".folded")):
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        entries.append({"name": name, "size": stat.st_size, "created_at": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["created_at"], reverse=True)
+
+
+def _prune():
+    for entry in list_profiles()[MAX_PROFILES:]:
+        try:
+            os.remove(os.path.join(_state["directory"], entry["name"]))
+        except OSError:
+            pass
+
+
+def profile_directory() -> str:
+    return _state["directory"]
+
+
+def init_app(app, directory: str):
+    """Profile armed requests; register after admission control so queueing is not profiled."""
+    os.makedirs(directory, exist_ok=True)
+    _state["directory"] = directory
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_abandon)
@@ -0,0 +1,25 @@
+"""Per-process background scheduler, created lazily because threads do not survive a fork."""
+
+import os
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+_state = {"scheduler": None, "pid": None}
+_lock = threading.Lock()
+
+
+def get_scheduler() -> BackgroundScheduler:
+    """Return this process's running scheduler, starting it on first use."""
+    with _lock:
+        if _state["scheduler"] is None or _state["pid"] != os.getpid():
+            scheduler = BackgroundScheduler(daemon=True, job_defaults={"coalesce": True, "max_instances": 1})
+            scheduler.start()
+            _state["scheduler"] = scheduler
+            _state["pid"] = os.getpid()
+        return _state["scheduler"]
+
+
+def scheduler_started() -> bool:
+    """True if this process already owns a running scheduler."""
+    return _state["scheduler"] is not None and _state["pid"] == os.getpid()
@@ -1,9 +1,22 @@
+import asyncio
+import contextvars
 import json
-from functools import lru_cache
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
 
+from .cache import LEASE_WAIT, CacheBackend, FlightTimeout, MemoryCacheBackend, SingleFlight
+
+logger = logging.getLogger(__name__)
 
 def get_server_headers(server):
     """Get headers based on server type."""
@@ -22,7 +35,7 @@ def get_server_headers(server):
 
 
 def _session_cache_key(server) -> tuple:
-    """Stable cache key for a server's HTTP session."""
+    """Fingerprint of everything a server's HTTP session depends on."""
     return (
         server.server_type,
         server.url.rstrip("/"),
@@ -30,14 +43,961 @@ def _session_cache_key(server) -> tuple:
     )
 
 
-@lru_cache(maxsize=12)
-def _session_for_key(cache_key: tuple) -> requests.Session:
-    """Create a pooled HTTP session for reuse across requests."""
-    session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(pool_connections=6, pool_maxsize=12)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+# ---------- Connection pools ----------
+
+MAX_POOLS = int(os.environ.get("FAVARR_MAX_POOLS", "64"))
+POOL_KEEPALIVE_AFTER = 45.0  # seconds idle before a pool gets a keep-alive ping
+POOL_MAX_IDLE = 30 * 60.0  # seconds idle before a pool is closed outright
+
+
+class ServerPool:
+    """A requests.Session sized for one server, with usage counters."""
+
+    def __init__(self, base_url: str, fingerprint: tuple, size: int):
+        self.base_url = base_url
+        self.fingerprint = fingerprint
+        self.size = size
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.requests = 0
+        self.waits = 0
+        self.keepalives = 0
+        self._lock = threading.Lock()
+
+    def checkout(self):
+        with self._lock:
+            if self.in_use >= self.size:
+                # Beyond pool_maxsize urllib3 opens a throwaway connection.
+                self.waits += 1
+            self.in_use += 1
+            self.requests += 1
+            self.last_used = time.monotonic()
+
+    def checkin(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            self.last_used = time.monotonic()
+
+    def idle_connections(self) -> int:
+        idle = 0
+        # http:// and https:// share one adapter; count it once.
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                queue = getattr(getattr(pool, "pool", None), "queue", None)
+                if queue is not None:
+                    idle += sum(1 for conn in list(queue) if conn is not None)
+        return idle
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def close(self):
+        self.session.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": self.idle_connections(),
+            "requests": self.requests,
+            "waits": self.waits,
+            "keepalives": self.keepalives,
+            "idle_seconds": round(self.idle_seconds(), 1),
+        }
+
+
+class PoolRegistry:
+    """Owns one ServerPool per server; closes pools on eviction or change."""
+
+    def __init__(self, max_pools: int = MAX_POOLS):
+        self.max_pools = max_pools
+        self._pools: "OrderedDict[Any, ServerPool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, server) -> ServerPool:
+        key = _server_key(server)
+        fingerprint = _session_cache_key(server)
+        size = _limiter_settings(server)[0]
+        stale = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None and (pool.fingerprint != fingerprint or pool.size != size):
+                stale.append(self._pools.pop(key))
+                pool = None
+            if pool is None:
+                pool = self._pools[key] = ServerPool(server.url.rstrip("/"), fingerprint, size)
+            self._pools.move_to_end(key)
+            while len(self._pools) > self.max_pools:
+                stale.append(self._pools.popitem(last=False)[1])
+                self.evictions += 1
+        for old in stale:
+            old.close()
+        return pool
+
+    def discard(self, server):
+        with self._lock:
+            pool = self._pools.pop(_server_key(server), None)
+        if pool is not None:
+            pool.close()
+
+    def refresh_idle(self, keepalive_after: float = POOL_KEEPALIVE_AFTER, max_idle: float = POOL_MAX_IDLE):
+        """Ping quiet pools so the next request skips the handshake; close abandoned ones."""
+        with self._lock:
+            pools = list(self._pools.items())
+        for key, pool in pools:
+            idle_for = pool.idle_seconds()
+            if idle_for >= max_idle:
+                with self._lock:
+                    if self._pools.get(key) is pool:
+                        del self._pools[key]
+                pool.close()
+            elif idle_for >= keepalive_after and not pool.in_use and pool.idle_connections():
+                try:
+                    pool.session.head(pool.base_url, timeout=(CONNECT_TIMEOUT, 5), allow_redirects=False)
+                    pool.keepalives += 1
+                except requests.exceptions.RequestException:
+                    pass
+
+    def close_all(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = list(self._pools.items())
+        return {
+            "pools": len(pools),
+            "max_pools": self.max_pools,
+            "evictions": self.evictions,
+            "by_server": {str(key): pool.snapshot() for key, pool in pools},
+        }
+
+
+pool_registry = PoolRegistry()
+
+
+def server_pool_state(server) -> Optional[Dict[str, Any]]:
+    """Pool stats for a server, or None if it has no open pool."""
+    with pool_registry._lock:
+        pool = pool_registry._pools.get(_server_key(server))
+    return pool.snapshot() if pool else None
+
+
+def refresh_idle_pools():
+    """Scheduled job: keep warm pools warm and close abandoned ones."""
+    pool_registry.refresh_idle()
+
+
+# ---------- Request deadlines ----------
+
+DEADLINE_SLACK = 0.05  # seconds; a timeout this close to the deadline was caused by it
+
+
+class DeadlineExceeded(Exception):
+    """The caller's time budget ran out before an upstream call could finish."""
+
+
+# Absolute time.monotonic() deadline of the current request, if any. Copied
+# into hedge threads and event-loop tasks so fan-out honours it too.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("favarr_deadline", default=None)
+
+
+def set_deadline(seconds: Optional[float]):
+    """Give the current context a budget of seconds from now; returns a token for reset_deadline."""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_expired() -> bool:
+    remaining = remaining_time()
+    return remaining is not None and remaining <= DEADLINE_SLACK
+
+
+def deadline_timeout(timeout: float, label: str = "Upstream call") -> float:
+    """Shrink timeout to the time left before the deadline; raise if none is left."""
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded(f"{label}: request deadline exceeded")
+    return min(timeout, remaining)
+
+
+# ---------- Circuit breaker ----------
+
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30.0
+
+# Only transport-level failures mean the server is unreachable; HTTP errors
+# prove it is up and answering.
+_BREAKER_FAILURES = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class AdaptiveTimeout(requests.exceptions.ReadTimeout):
+    """A read cut off by the adaptive timeout: slower than usual, not down, so the breaker ignores it."""
+
+
+class ServerUnavailableError(Exception):
+    """Raised without touching the network while a server's breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker guarding calls to a single server."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """Return True if a call may go out; half-open lets a single probe through."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+            self._last_error = None
+
+    def record_failure(self, error: Optional[str] = None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = error
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def abandon(self):
+        """Release a half-open probe slot without recording an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next half-open probe is allowed."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._state
+            if state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = self.HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+            }
+
+
+_breakers: Dict[Any, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _server_key(server):
+    """Identity used for per-server state; survives credential changes."""
+    return getattr(server, "id", None) or server.url.rstrip("/")
+
+
+def get_circuit_breaker(server) -> CircuitBreaker:
+    """Return the breaker for a server, creating it on first use."""
+    key = _server_key(server)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker()
+        return breaker
+
+
+def circuit_breaker_state(server) -> Dict[str, Any]:
+    """Breaker snapshot for API responses."""
+    breaker = get_circuit_breaker(server)
+    snapshot = breaker.snapshot()
+    snapshot["retry_after"] = round(breaker.retry_after(), 1)
+    return snapshot
+
+
+def reset_circuit_breaker(server):
+    """Forget breaker state, e.g. after the server's URL or credentials change."""
+    with _breakers_lock:
+        _breakers.pop(_server_key(server), None)
+
+
+def _guarded_call(server, label: str, call):
+    """Run an upstream call through the server's breaker."""
+    breaker = get_circuit_breaker(server)
+    if not breaker.allow():
+        raise ServerUnavailableError(
+            f"{label}: server unavailable (circuit open, retry in {breaker.retry_after():.0f}s)"
+        )
+    try:
+        result = call()
+    except ServerBusyError as exc:
+        # Never reached the server, so it says nothing about its health.
+        breaker.abandon()
+        if deadline_expired():
+            raise DeadlineExceeded(f"{label}: request deadline exceeded") from exc
+        raise
+    except DeadlineExceeded:
+        breaker.abandon()
+        raise
+    except _BREAKER_FAILURES as exc:
+        if deadline_expired():
+            # Our own budget ran out; the server may simply be slower than it.
+            breaker.abandon()
+            raise DeadlineExceeded(f"{label}: request deadline exceeded") from exc
+        if isinstance(exc, AdaptiveTimeout):
+            breaker.abandon()
+            raise
+        breaker.record_failure(str(exc))
+        raise
+    except Exception:
+        # Anything else (HTTP errors, bad JSON) still proves the server answered.
+        breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+# ---------- Concurrency & rate limits ----------
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("FAVARR_UPSTREAM_MAX_CONCURRENCY", "8"))
+DEFAULT_RATE_LIMIT = float(os.environ.get("FAVARR_UPSTREAM_RATE_LIMIT", "0"))
+LIMITER_MAX_WAIT = float(os.environ.get("FAVARR_UPSTREAM_MAX_WAIT", "15"))
+
+
+class ServerBusyError(Exception):
+    """Raised when a call waited too long for a concurrency slot or rate token."""
+
+
+class ServerLimiter:
+    """Per-server semaphore plus token bucket with a bounded, measured queue."""
+
+    def __init__(self, max_concurrency: int, rate: float = 0, burst: Optional[int] = None):
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._tokens = 0.0
+        self._refilled_at = time.monotonic()
+        self.acquired = 0
+        self.waited = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.configure(max_concurrency, rate, burst)
+        self._tokens = float(self.burst)
+
+    def configure(self, max_concurrency: int, rate: float = 0, burst: Optional[int] = None):
+        with self._cond:
+            self.max_concurrency = max(1, int(max_concurrency))
+            self.rate = max(0.0, float(rate or 0))
+            self.burst = max(1, int(burst or max(1, round(self.rate))))
+            self._tokens = min(self._tokens, float(self.burst))
+            self._cond.notify_all()
+
+    def _refill(self, now: float):
+        if self.rate:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _take(self, now: float) -> Optional[float]:
+        """Under the lock: take a slot if possible, else return how long to pause."""
+        self._refill(now)
+        has_slot = self._in_flight < self.max_concurrency
+        has_token = not self.rate or self._tokens >= 1
+        if has_slot and has_token:
+            self._in_flight += 1
+            if self.rate:
+                self._tokens -= 1
+            return None
+        if has_slot:
+            return (1 - self._tokens) / self.rate
+        return LIMITER_MAX_WAIT
+
+    def _busy(self) -> ServerBusyError:
+        self.rejected += 1
+        return ServerBusyError(f"server busy ({self._in_flight} in flight, {self._queued - 1} queued)")
+
+    def _acquired(self, waited: float) -> float:
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+        return waited
+
+    def acquire(self, max_wait: float = LIMITER_MAX_WAIT) -> float:
+        """Take a slot (and a token when rate limited); returns seconds waited."""
+        started = time.monotonic()
+        deadline = started + max_wait
+        with self._cond:
+            self._queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    pause = self._take(now)
+                    if pause is None:
+                        return self._acquired(now - started)
+                    if now >= deadline:
+                        raise self._busy()
+                    self._cond.wait(min(pause, deadline - now))
+            finally:
+                self._queued -= 1
+
+    async def acquire_async(self, max_wait: float = LIMITER_MAX_WAIT) -> float:
+        """Event-loop friendly acquire: polls instead of blocking the loop thread."""
+        started = time.monotonic()
+        deadline = started + max_wait
+        poll = 0.005
+        with self._cond:
+            self._queued += 1
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    pause = self._take(now)
+                    if pause is None:
+                        return self._acquired(now - started)
+                    if now >= deadline:
+                        raise self._busy()
+                await asyncio.sleep(min(pause, poll, deadline - now))
+                poll = min(poll * 2, 0.1)
+        finally:
+            with self._cond:
+                self._queued -= 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._cond.notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "rate_limit": self.rate,
+                "rate_burst": self.burst,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.waited * 1000, 1) if self.waited else 0.0,
+                "max_wait_ms": round(self.max_wait_seen * 1000, 1),
+            }
+
+
+_limiters: Dict[Any, ServerLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_settings(server) -> Tuple[int, float, Optional[int]]:
+    max_concurrency = getattr(server, "max_concurrency", None) or DEFAULT_MAX_CONCURRENCY
+    rate = getattr(server, "rate_limit", None)
+    rate = DEFAULT_RATE_LIMIT if rate is None else rate
+    return max_concurrency, rate, getattr(server, "rate_burst", None)
+
+
+def get_server_limiter(server) -> ServerLimiter:
+    """Return the server's limiter, applying its current configured limits."""
+    key = _server_key(server)
+    settings = _limiter_settings(server)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = ServerLimiter(*settings)
+            return limiter
+    if (limiter.max_concurrency, limiter.rate) != settings[:2] or (settings[2] and limiter.burst != settings[2]):
+        limiter.configure(*settings)
+    return limiter
+
+
+def server_limiter_state(server) -> Dict[str, Any]:
+    """Limiter snapshot (queue depth, waits, rejections) for API responses."""
+    return get_server_limiter(server).snapshot()
+
+
+def limiter_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshots of every limiter in this process, keyed by server."""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {str(key): limiter.snapshot() for key, limiter in limiters}
+
+
+# ---------- Adaptive timeouts & hedged reads ----------
+
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+TIMEOUT_FLOOR = 2.0
+TIMEOUT_P99_MULTIPLIER = 3.0
+CONNECT_TIMEOUT = 5.0
+HEDGED_READS = os.environ.get("FAVARR_HEDGED_READS", "").lower() in ("1", "true", "yes")
+HEDGE_WORKERS = 8
+
+# Path segments that look like ids collapse so /Users/<id>/Items is one class.
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[^/]+$|^[0-9a-fA-F-]{16,}$")
+
+
+class LatencyTracker:
+    """Rolling window of request latencies (seconds) for one server/endpoint class."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = LATENCY_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+_latency: Dict[tuple, LatencyTracker] = {}
+_latency_lock = threading.Lock()
+
+
+# Params that change how much work a request asks for. Calls with different
+# shapes get separate latency windows (and timeouts): a 3500-item listing must
+# not be timed against the p99 of 5-item "recent" calls on the same path.
+_SEARCH_PARAMS = ("SearchTerm", "searchTerm", "q", "query")
+_LIMIT_PARAMS = ("Limit", "limit")
+_LIMIT_BUCKETS = ((50, "small"), (500, "medium"))
+
+
+def _request_shape(endpoint: str, params: Optional[Dict]) -> List[str]:
+    query = dict(urllib.parse.parse_qsl(endpoint.split("?", 1)[1])) if "?" in endpoint else {}
+    query.update({k: v for k, v in (params or {}).items() if v is not None})
+    shape = []
+    if any(query.get(name) for name in _SEARCH_PARAMS):
+        shape.append("search")
+    if str(query.get("Recursive", "")).lower() == "true":
+        shape.append("recursive")
+    limit = next((query[name] for name in _LIMIT_PARAMS if name in query), None)
+    if limit is not None:
+        try:
+            size = int(limit)
+        except (TypeError, ValueError):
+            size = None
+        if size is not None and size > 0:
+            shape.append(next((label for bound, label in _LIMIT_BUCKETS if size <= bound), "large"))
+    elif shape:
+        shape.append("unbounded")
+    return shape
+
+
+def endpoint_class(method: str, endpoint: str, params: Optional[Dict] = None) -> str:
+    """Collapse a request into a low-cardinality class like 'GET /Users/{id}/Items [recursive,large]'."""
+    path = endpoint.split("?", 1)[0]
+    segments = ["{id}" if _ID_SEGMENT.match(seg) else seg for seg in path.strip("/").split("/") if seg]
+    shape = _request_shape(endpoint, params)
+    suffix = f" [{','.join(shape)}]" if shape else ""
+    return f"{method.upper()} /{'/'.join(segments)}{suffix}"
+
+
+def get_latency_tracker(server, endpoint_cls: str) -> LatencyTracker:
+    key = (_server_key(server), endpoint_cls)
+    with _latency_lock:
+        tracker = _latency.get(key)
+        if tracker is None:
+            tracker = _latency[key] = LatencyTracker()
+        return tracker
+
+
+def adaptive_timeout(server, endpoint_cls: str, ceiling: float) -> float:
+    """Read timeout derived from observed p99, never above the caller's ceiling."""
+    p99 = get_latency_tracker(server, endpoint_cls).percentile(99)
+    if p99 is None:
+        return ceiling
+    return min(ceiling, max(TIMEOUT_FLOOR, p99 * TIMEOUT_P99_MULTIPLIER))
+
+
+def upstream_latency_state(server) -> Dict[str, Dict[str, Any]]:
+    """Per endpoint class latency summary (milliseconds) for API responses."""
+    key = _server_key(server)
+    with _latency_lock:
+        trackers = {cls: t for (skey, cls), t in _latency.items() if skey == key}
+    state = {}
+    for cls, tracker in sorted(trackers.items()):
+        summary = {"samples": len(tracker)}
+        for pct in (50, 95, 99):
+            value = tracker.percentile(pct, min_samples=1)
+            summary[f"p{pct}"] = round(value * 1000, 1) if value is not None else None
+        state[cls] = summary
+    return state
+
+
+def reset_latency_state(server):
+    key = _server_key(server)
+    with _latency_lock:
+        for tracker_key in [k for k in _latency if k[0] == key]:
+            del _latency[tracker_key]
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_pid: Optional[int] = None
+_hedge_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    # Created lazily per process: gunicorn --preload forks after import, and
+    # executor threads do not survive a fork.
+    global _hedge_executor, _hedge_pid
+    with _hedge_lock:
+        if _hedge_executor is None or _hedge_pid != os.getpid():
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="favarr-hedge")
+            _hedge_pid = os.getpid()
+        return _hedge_executor
+
+
+def _hedged_call(call, delay: float):
+    """Run call; if it outlives delay, race a duplicate and return the first success."""
+    executor = _get_hedge_executor()
+    # Each attempt runs in a copy of the caller's context so it sees the request deadline.
+    primary = executor.submit(contextvars.copy_context().run, call)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    pending = {primary, executor.submit(contextvars.copy_context().run, call)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+_upstream_hooks: List[Callable[..., None]] = []
+
+
+def on_upstream_call(hook: Callable[..., None]):
+    """Register hook(server, endpoint_cls, seconds, status, error) run after every upstream call; must be cheap."""
+    _upstream_hooks.append(hook)
+    return hook
+
+
+def notify_upstream_call(server, endpoint_cls: str, seconds: float, status: Optional[int] = None, error=None):
+    for hook in _upstream_hooks:
+        try:
+            hook(server, endpoint_cls, seconds, status, error)
+        except Exception:
+            logger.debug("Upstream call hook failed", exc_info=True)
+
+
+def _timed_request(server, endpoint_cls: str, send, timeout: float, adaptive: bool = False):
+    """Issue send(session, timeout) under the server's limiter and record its latency."""
+    tracker = get_latency_tracker(server, endpoint_cls)
+    limiter = get_server_limiter(server)
+    limiter.acquire(deadline_timeout(LIMITER_MAX_WAIT))
+    try:
+        timeout = deadline_timeout(timeout)
+    except DeadlineExceeded:
+        limiter.release()
+        raise
+    pool = pool_registry.get(server)
+    pool.checkout()
+    started = time.monotonic()
+    try:
+        response = send(pool.session, (min(CONNECT_TIMEOUT, timeout), timeout))
+    except Exception as exc:
+        elapsed = time.monotonic() - started
+        # Censored sample: keeps the distribution honest for slow servers,
+        # unless the request deadline rather than the server cut it short.
+        if isinstance(exc, requests.exceptions.Timeout) and not deadline_expired():
+            tracker.record(elapsed)
+        notify_upstream_call(server, endpoint_cls, elapsed, error=exc)
+        if adaptive and isinstance(exc, requests.exceptions.ReadTimeout):
+            raise AdaptiveTimeout(*exc.args, request=exc.request, response=exc.response) from exc
+        raise
+    finally:
+        pool.checkin()
+        limiter.release()
+    elapsed = time.monotonic() - started
+    tracker.record(elapsed)
+    notify_upstream_call(server, endpoint_cls, elapsed, status=response.status_code)
+    return response
+
+
+# ---------- Response cache ----------
+
+# (path pattern, required params, ttl seconds, group). Only GETs are cached.
+CACHE_RULES = [
+    (re.compile(r"^/(Users|api/users|accounts)$"), None, 300, "users"),
+    (re.compile(r"^/(Library/VirtualFolders|api/libraries|library/sections)$"), None, 300, "libraries"),
+    (re.compile(r"^/(System/Info)?$"), None, 60, "system"),
+    (re.compile(r"^/api/collections(/[^/]+)?$"), None, 30, "collections"),
+    (re.compile(r"^/api/items/[^/]+$"), None, 60, "items"),
+    (re.compile(r"^/Users/[^/]+/Items$"), {"Filters": "IsFavorite"}, 30, "favorites"),
+    (re.compile(r"^/library/all$"), {"userRating>>": None}, 30, "favorites"),
+]
+
+# Writes matching a pattern drop the listed groups for that server.
+CACHE_INVALIDATIONS = [
+    (re.compile(r"^/Users/[^/]+/FavoriteItems/"), ("favorites",)),
+    (re.compile(r"^/:/rate$"), ("favorites",)),
+    (re.compile(r"^/api/collections"), ("collections", "favorites")),
+    (re.compile(r"^/api/items/"), ("items", "collections", "favorites")),
+    (re.compile(r"^/Users(/[^/]+)?(/(Policy|Configuration|Password))?$"), ("users",)),
+    (re.compile(r"^/Library/"), ("libraries",)),
+]
+
+STREMIO_CACHE_TTL = 60
+
+# Groups kept this long (seconds) past their TTL. An expired copy, including
+# one that survived a restart, is served at once while a background request
+# refreshes it.
+CACHE_STALE_FOR = {"users": 86400, "libraries": 86400, "system": 86400, "library": 86400}
+REVALIDATE_LEASE = 60  # seconds one worker owns a key's background refresh
+REVALIDATE_WORKERS = 2
+FLIGHT_WORKERS = 16  # shared fetches running for callers that have a deadline
+
+# Replaced at startup with the backend chosen in app.py.
+_cache_backend: Dict[str, CacheBackend] = {"backend": MemoryCacheBackend()}
+# Concurrent identical GETs within a process share one upstream round-trip.
+inflight_reads = SingleFlight()
+
+
+def get_response_cache() -> CacheBackend:
+    return _cache_backend["backend"]
+
+
+def set_response_cache(backend: CacheBackend):
+    """Swap the response cache backend (e.g. for one shared across workers)."""
+    _cache_backend["backend"] = backend
+
+
+def _cache_rule(endpoint: str, params: Optional[Dict]) -> Optional[Tuple[float, str]]:
+    path = endpoint.split("?", 1)[0]
+    for pattern, required, ttl, group in CACHE_RULES:
+        if not pattern.match(path):
+            continue
+        if required and not all(
+            key in (params or {}) and (value is None or str(params[key]) == value)
+            for key, value in required.items()
+        ):
+            continue
+        return ttl, group
+    return None
+
+
+def _cache_key(server, endpoint: str, params: Optional[Dict]) -> str:
+    encoded = json.dumps(params or {}, sort_keys=True, default=str)
+    return f"{_server_key(server)}|{server.url.rstrip('/')}|{endpoint}|{encoded}"
+
+
+def _cache_tags(server, group: str) -> Tuple[str, str]:
+    key = _server_key(server)
+    return f"{key}", f"{key}:{group}"
+
+
+def cache_plan(server, method: str, endpoint: str, params: Optional[Dict], use_cache: bool = True):
+    """Return (key, ttl, tags, stale_for) if the request may be served from cache, else None."""
+    rule = _cache_rule(endpoint, params) if use_cache and method.upper() == "GET" else None
+    if rule is None:
+        return None
+    ttl, group = rule
+    return _cache_key(server, endpoint, params), ttl, _cache_tags(server, group), CACHE_STALE_FOR.get(group, 0)
+
+
+_cache_lookup_hooks: List[Callable[[float, bool], None]] = []
+
+
+def on_cache_lookup(hook: Callable[[float, bool], None]):
+    """Register hook(seconds, hit) run after every response cache lookup; must be cheap."""
+    _cache_lookup_hooks.append(hook)
+    return hook
+
+
+def lookup_cached(plan) -> Tuple[Optional[bytes], bool]:
+    """Return (body, stale) for a cache plan; body is None on a miss."""
+    if plan is None:
+        return None, False
+    started = time.perf_counter()
+    key, _, _, stale_for = plan
+    cache = get_response_cache()
+    body = cache.get(key)
+    stale = False
+    if body is None and stale_for:
+        body = cache.get_stale(key)
+        stale = body is not None
+    for hook in _cache_lookup_hooks:
+        hook(time.perf_counter() - started, body is not None)
+    return body, stale
+
+
+def store_cached(plan, body: bytes):
+    if plan is not None:
+        key, ttl, tags, stale_for = plan
+        get_response_cache().set(key, body, ttl, tags, stale_for)
+
+
+def claim_revalidation(plan) -> bool:
+    """True if this caller should refresh a stale entry (one worker per key)."""
+    return get_response_cache().add(f"revalidate:{plan[0]}", b"1", REVALIDATE_LEASE)
+
+
+def release_revalidation(plan):
+    get_response_cache().delete(f"revalidate:{plan[0]}")
+
+
+_revalidate_executor: Optional[ThreadPoolExecutor] = None
+_revalidate_pid: Optional[int] = None
+_revalidate_lock = threading.Lock()
+
+
+def _get_revalidate_executor() -> ThreadPoolExecutor:
+    global _revalidate_executor, _revalidate_pid
+    with _revalidate_lock:
+        if _revalidate_executor is None or _revalidate_pid != os.getpid():
+            _revalidate_executor = ThreadPoolExecutor(
+                max_workers=REVALIDATE_WORKERS, thread_name_prefix="favarr-revalidate"
+            )
+            _revalidate_pid = os.getpid()
+        return _revalidate_executor
+
+
+def _revalidate(plan, fetch: Callable[[], bytes]):
+    try:
+        store_cached(plan, fetch())
+    except Exception as exc:
+        logger.info("Background refresh of %s failed: %s", plan[0], exc)
+    finally:
+        release_revalidation(plan)
+
+
+_flight_executor: Optional[ThreadPoolExecutor] = None
+_flight_pid: Optional[int] = None
+_flight_lock = threading.Lock()
+
+
+def _get_flight_executor() -> ThreadPoolExecutor:
+    global _flight_executor, _flight_pid
+    with _flight_lock:
+        if _flight_executor is None or _flight_pid != os.getpid():
+            _flight_executor = ThreadPoolExecutor(max_workers=FLIGHT_WORKERS, thread_name_prefix="favarr-flight")
+            _flight_pid = os.getpid()
+        return _flight_executor
+
+
+def without_deadline(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """Wrap fn to run with no request deadline, for work shared by several callers."""
+
+    def run():
+        _deadline.set(None)  # only affects the context run() is called in
+        return fn()
+
+    return run
+
+
+def _spawn_flight(job: Callable[[], None]):
+    _get_flight_executor().submit(contextvars.copy_context().run, job)
+
+
+def coalesced_read(flight_key: str, fetch: Callable[[], bytes]) -> bytes:
+    """Share one fetch among concurrent identical reads; each caller waits only until its own deadline."""
+    remaining = remaining_time()
+    try:
+        return inflight_reads.do(flight_key, without_deadline(fetch), timeout=remaining, spawn=_spawn_flight)
+    except FlightTimeout as exc:
+        raise DeadlineExceeded("Upstream call: request deadline exceeded") from exc
+
+
+def _read_through(plan, flight_key: str, fetch: Callable[[], bytes]) -> bytes:
+    """Serve a read from cache, or fetch it once per key across threads and workers."""
+    if plan is None:
+        return coalesced_read(flight_key, fetch)
+    body, stale = lookup_cached(plan)
+    if body is not None:
+        if stale and claim_revalidation(plan):
+            _get_revalidate_executor().submit(_revalidate, plan, fetch)
+        return body
+    key, ttl, tags, stale_for = plan
+    return coalesced_read(
+        key, lambda: get_response_cache().get_or_compute(key, ttl, fetch, tags, wait=LEASE_WAIT, stale_for=stale_for)
+    )
+
+
+def cached_value(server, name: str, ttl: float, compute: Callable[[], Any], group: Optional[str] = None):
+    """Memoise a JSON-serialisable value derived from a server's data, shared by all workers."""
+    key = f"{_server_key(server)}|value|{name}"
+    tags = _cache_tags(server, group) if group else (str(_server_key(server)),)
+    cache = get_response_cache()
+    body = cache.get(key)
+    if body is None:
+        body = cache.get_or_compute(key, ttl, lambda: json.dumps(compute()).encode(), tags)
+    return json.loads(body)
+
+
+def invalidate_after_write(server, method: str, endpoint: str):
+    """Drop cache groups a write to endpoint may have changed."""
+    if method.upper() == "GET":
+        return
+    path = endpoint.split("?", 1)[0]
+    groups = {group for pattern, groups in CACHE_INVALIDATIONS if pattern.match(path) for group in groups}
+    if groups:
+        get_response_cache().invalidate_tags(_cache_tags(server, group)[1] for group in groups)
+
+
+def invalidate_server_cache(server):
+    """Forget everything cached for a server."""
+    get_response_cache().invalidate_tags([str(_server_key(server))])
+
+
+def _parse_body(body: bytes):
+    return json.loads(body) if body else {}
 
 
 def server_request(
@@ -47,25 +1007,133 @@ def server_request(
     params: Optional[Dict] = None,
     data: Any = None,
     timeout: float = 20,
+    hedge: Optional[bool] = None,
+    use_cache: bool = True,
 ):
     """Make a request to a specific server using a cached Session for speed."""
     if server.server_type == "stremio":
         raise ValueError("server_request is not supported for Stremio; use stremio_request instead")
+    plan = cache_plan(server, method, endpoint, params, use_cache)
+    if (plan is not None and plan[3]) or remaining_time() is not None:
+        server = server_snapshot(server)  # a background refresh or shared fetch may outlive the request
     url = f"{server.url.rstrip('/')}{endpoint}"
-    try:
-        session = _session_for_key(_session_cache_key(server))
-        response = session.request(
+    endpoint_cls = endpoint_class(method, endpoint, params)
+    is_read = method.upper() == "GET"
+    read_timeout = adaptive_timeout(server, endpoint_cls, timeout) if is_read else timeout
+
+    def send(session, request_timeout):
+        return session.request(
             method=method,
             url=url,
             headers=get_server_headers(server),
             params=params,
             json=data,
-            timeout=timeout,
+            timeout=request_timeout,
         )
+
+    def attempt():
+        response = _timed_request(server, endpoint_cls, send, read_timeout, adaptive=read_timeout < timeout)
         response.raise_for_status()
-        return response.json() if response.content else {}
-    except requests.exceptions.RequestException as exc:
+        return response.content
+
+    def call():
+        hedge_delay = get_latency_tracker(server, endpoint_cls).percentile(95) if is_read else None
+        if (HEDGED_READS if hedge is None else hedge) and hedge_delay is not None:
+            return _hedged_call(attempt, hedge_delay)
+        return attempt()
+
+    try:
+        if is_read:
+            body = _read_through(
+                plan,
+                _cache_key(server, endpoint, params),
+                lambda: _guarded_call(server, "Server API error", call),
+            )
+        else:
+            body = _guarded_call(server, "Server API error", call)
+        return _parse_body(body)
+    except (requests.exceptions.RequestException, ValueError) as exc:
         raise Exception(f"Server API error: {exc}") from exc
+    finally:
+        invalidate_after_write(server, method, endpoint)
+
+
+_reset_hooks: List[Callable[[Any], None]] = []
+
+
+def on_server_reset(hook: Callable[[Any], None]):
+    """Register a callback run by reset_server_state (e.g. to drop other pools)."""
+    _reset_hooks.append(hook)
+    return hook
+
+
+# ---------- Server health ----------
+
+HEALTH_TTL = 86400  # seconds a recorded check stays visible
+
+
+def _health_key(server) -> str:
+    return f"health:{_server_key(server)}"
+
+
+def record_server_health(server, status: str, **detail):
+    """Store the outcome of a connectivity check where every worker can read it."""
+    state = {"status": status, "checked_at": time.time(), **detail}
+    get_response_cache().set(_health_key(server), json.dumps(state).encode(), HEALTH_TTL)
+    return state
+
+
+def server_health_state(server) -> Dict[str, Any]:
+    """Last recorded connectivity check for a server, or status 'unknown'."""
+    body = get_response_cache().get(_health_key(server))
+    return json.loads(body) if body else {"status": "unknown", "checked_at": None}
+
+
+def reset_server_state(server):
+    """Drop all per-server runtime state after the server is edited or removed."""
+    reset_circuit_breaker(server)
+    reset_latency_state(server)
+    with _limiters_lock:
+        _limiters.pop(_server_key(server), None)
+    pool_registry.discard(server)
+    invalidate_server_cache(server)
+    get_response_cache().delete(_health_key(server))
+    for hook in _reset_hooks:
+        hook(server)
+
+
+def server_snapshot(server) -> SimpleNamespace:
+    """Plain copy of a Server row, safe to hand to other threads or the event loop."""
+    if isinstance(server, SimpleNamespace):
+        return server
+    return SimpleNamespace(**{column.key: getattr(server, column.key) for column in server.__table__.columns})
+
+
+def _on_server(server, url: str) -> bool:
+    """True if url points at the server itself rather than a third-party host."""
+    target, base = urllib.parse.urlsplit(url), urllib.parse.urlsplit(server.url)
+    return (target.scheme, target.netloc.lower()) == (base.scheme, base.netloc.lower())
+
+
+def server_fetch_image(server, url: str, params: Optional[Dict] = None, timeout: float = 30) -> Tuple[bytes, str]:
+    """Fetch raw image bytes; server URLs go through its session, breaker and adaptive timeout."""
+    if not _on_server(server, url):
+        # e.g. Stremio poster CDNs: a slow third-party host must not trip the server's breaker
+        response = requests.get(url, params=params, timeout=deadline_timeout(timeout, "Image"))
+        response.raise_for_status()
+        return response.content, response.headers.get("Content-Type", "image/jpeg")
+    endpoint_cls = "GET image"
+    read_timeout = adaptive_timeout(server, endpoint_cls, timeout)
+
+    def send(session, request_timeout):
+        return session.get(url, params=params, headers=get_server_headers(server), timeout=request_timeout)
+
+    def call():
+        response = _timed_request(server, endpoint_cls, send, read_timeout, adaptive=read_timeout < timeout)
+        response.raise_for_status()
+        return response.content, response.headers.get("Content-Type", "image/jpeg")
+
+    return _guarded_call(server, "Image error", call)
 
 
 def plex_item_played(item) -> bool:
@@ -220,16 +1288,12 @@ def abs_map_item(item: dict) -> dict:
 
 
 def abs_fetch_items(server, item_ids: Iterable[str]) -> List[dict]:
-    """Fetch Audiobookshelf items by id."""
-    items = []
-    for item_id in item_ids:
-        try:
-            item = server_request(server, f"/api/items/{item_id}")
-            if item:
-                items.append(abs_map_item(item))
-        except Exception:
-            continue
-    return items
+    """Fetch Audiobookshelf items by id, concurrently; failed ids are skipped."""
+    from .aio import async_server_request, gather_async
+
+    snapshot = server_snapshot(server)
+    results = gather_async(async_server_request(snapshot, f"/api/items/{item_id}") for item_id in item_ids)
+    return [abs_map_item(item) for item in results if item and not isinstance(item, Exception)]
 
 
 def abs_fetch_collection(server, collection_id):
@@ -372,7 +1436,23 @@ def _stremio_base(server) -> str:
     return base
 
 
-def stremio_request(server, method: str, params: Optional[Dict] = None, timeout: float = 20):
+# Stremio API methods that only read state; safe to time out adaptively.
+STREMIO_READ_METHODS = ("datastoreMeta", "datastoreGet", "addonCollectionGet")
+
+
+def stremio_cache_plan(server, method: str, params: Optional[Dict], use_cache: bool = True):
+    """Stremio flavour of cache_plan: read-only API methods are cached briefly."""
+    if not use_cache or method not in STREMIO_READ_METHODS:
+        return None
+    return (
+        _cache_key(server, f"/api/{method}", params),
+        STREMIO_CACHE_TTL,
+        _cache_tags(server, "library"),
+        CACHE_STALE_FOR["library"],
+    )
+
+
+def stremio_request(server, method: str, params: Optional[Dict] = None, timeout: float = 20, use_cache: bool = True):
     """
     Call a Stremio cloud API method.
     This uses the documented pattern of POSTing to /api/<method> with a JSON body
@@ -380,19 +1460,37 @@ def stremio_request(server, method: str, params: Optional[Dict] = None, timeout:
     """
     if not server.token:
         raise Exception("Stremio authKey is required")
-
-    session = _session_for_key(_session_cache_key(server))
+    plan = stremio_cache_plan(server, method, params, use_cache)
+    if plan is not None or remaining_time() is not None:
+        server = server_snapshot(server)
     url = f"{_stremio_base(server)}/{method}"
     payload: Dict[str, Any] = {"type": method[0].upper() + method[1:]}
     payload["authKey"] = server.token
     if params:
         payload.update(params)
 
-    try:
-        response = session.post(url, json=payload, headers=get_server_headers(server), timeout=timeout)
+    endpoint_cls = f"POST /api/{method}"
+    read_timeout = adaptive_timeout(server, endpoint_cls, timeout) if method in STREMIO_READ_METHODS else timeout
+
+    def send(session, request_timeout):
+        return session.post(url, json=payload, headers=get_server_headers(server), timeout=request_timeout)
+
+    def call():
+        response = _timed_request(server, endpoint_cls, send, read_timeout, adaptive=read_timeout < timeout)
         response.raise_for_status()
-        return response.json() if response.content else {}
-    except requests.exceptions.RequestException as exc:
+        return response.content
+
+    try:
+        if method in STREMIO_READ_METHODS:
+            body = _read_through(
+                plan,
+                _cache_key(server, f"/api/{method}", params),
+                lambda: _guarded_call(server, "Stremio API error", call),
+            )
+        else:
+            body = _guarded_call(server, "Stremio API error", call)
+        return _parse_body(body)
+    except (requests.exceptions.RequestException, ValueError) as exc:
         raise Exception(f"Stremio API error: {exc}") from exc
 
 
@@ -0,0 +1,230 @@
+"""Per-request Server-Timing breakdown and the slow-request journal; see docs/diagnostics.md."""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import g, request
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+from .extensions import db
+from .models import SlowRequest
+from .services import _server_key, on_cache_lookup, on_upstream_call
+
+ALWAYS_LIST_CALLS = os.environ.get("FAVARR_UPSTREAM_CALLS_HEADER", "").lower() in ("1", "true", "yes")
+MAX_HEADER_GROUPS = 20  # endpoint classes listed in X-Upstream-Calls, slowest first
+EXPOSED_HEADERS = ["Server-Timing", "X-Upstream-Calls"]
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("FAVARR_SLOW_REQUEST_MS", "5000")) / 1000
+SLOW_REQUEST_ROWS = int(os.environ.get("FAVARR_SLOW_REQUEST_ROWS", "500"))
+MAX_JOURNAL_CALLS = 500  # upstream calls kept per slow request
+MAX_PARAM_LENGTH = 200
+SENSITIVE_PARAM = re.compile(r"key|token|pass|secret|auth|sig", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["RequestTimings"]] = contextvars.ContextVar(
+    "favarr_request_timings", default=None
+)
+
+
+class RequestTimings:
+    """Counts and durations for one request; appended to from several threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls: List[Dict[str, Any]] = []  # upstream calls in completion order
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add_call(self, server, endpoint_cls: str, seconds: float, status: Optional[int], error):
+        call = {
+            "server": str(_server_key(server)),
+            "endpoint": endpoint_cls,
+            "ms": round(seconds * 1000, 1),
+            "status": status,
+            "error": type(error).__name__ if error is not None else None,
+            "at_ms": round((time.perf_counter() - seconds - self.started) * 1000, 1),
+        }
+        with self._lock:
+            self.calls.append(call)
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def add_cache_lookup(self, seconds: float, hit: bool):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+            self.cache_seconds += seconds
+
+    def ordered_calls(self) -> List[Dict[str, Any]]:
+        """Upstream calls in the order they were issued."""
+        with self._lock:
+            return sorted(self.calls, key=lambda c: c["at_ms"])
+
+    def upstream_seconds(self) -> float:
+        with self._lock:
+            return sum(c["ms"] for c in self.calls) / 1000
+
+    def server_timing(self) -> str:
+        # Upstream durations are summed, so concurrent fan-out can exceed the total.
+        with self._lock:
+            calls = len(self.calls)
+            upstream_ms = sum(c["ms"] for c in self.calls)
+            parts = [
+                f'upstream;dur={upstream_ms:.1f};desc="{calls} calls"',
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"',
+                f'cache;dur={self.cache_seconds * 1000:.1f};desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            ]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def upstream_summary(self) -> str:
+        groups: Dict[str, List[float]] = {}
+        with self._lock:
+            for call in self.calls:
+                entry = groups.setdefault(call["endpoint"], [0, 0.0])
+                entry[0] += 1
+                entry[1] += call["ms"]
+        ranked = sorted(groups.items(), key=lambda item: item[1][1], reverse=True)
+        summary = [f"{endpoint} x{count} {ms:.0f}ms" for endpoint, (count, ms) in ranked[:MAX_HEADER_GROUPS]]
+        if len(ranked) > MAX_HEADER_GROUPS:
+            summary.append(f"+{len(ranked) - MAX_HEADER_GROUPS} more")
+        return "; ".join(summary)
+
+
+def current() -> Optional[RequestTimings]:
+    """The collector for the request being handled, or None outside one."""
+    return _current.get()
+
+
+@on_upstream_call
+def _record_upstream(server, endpoint_cls, seconds, status, error):
+    timings = _current.get()
+    if timings is not None:
+        timings.add_call(server, endpoint_cls, seconds, status, error)
+
+
+@on_cache_lookup
+def _record_cache_lookup(seconds, hit):
+    timings = _current.get()
+    if timings is not None:
+        timings.add_cache_lookup(seconds, hit)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("favarr_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("favarr_query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    timings = _current.get()
+    if timings is not None:
+        timings.add_query(seconds)
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("favarr_query_started"):
+        conn.info["favarr_query_started"].pop()
+
+
+def _start():
+    g.timings_token = _current.set(RequestTimings())
+
+
+def _add_headers(response):
+    timings = _current.get()
+    if timings is None:
+        return response
+    response.headers["Server-Timing"] = timings.server_timing()
+    elapsed = timings.elapsed()
+    if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+        _journal_slow_request(timings, response, elapsed)
+    if timings.calls and (ALWAYS_LIST_CALLS or request.headers.get("X-Upstream-Calls") == "1"):
+        response.headers["X-Upstream-Calls"] = timings.upstream_summary()
+    return response
+
+
+def scrub_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of params with credential-like values masked and long values cut."""
+    scrubbed = {}
+    for name, value in params.items():
+        if SENSITIVE_PARAM.search(name):
+            scrubbed[name] = "***"
+        else:
+            text = str(value)
+            scrubbed[name] = text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + "..."
+    return scrubbed
+
+
+def _journal_slow_request(timings: RequestTimings, response, seconds: float):
+    calls = timings.ordered_calls()
+    params = dict(request.view_args or {})
+    params.update(request.args.to_dict())
+    row = {
+        "method": request.method,
+        "route": request.url_rule.rule if request.url_rule else "unmatched",
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round(seconds * 1000, 1),
+        "params": json.dumps(scrub_params(params)),
+        "upstream_calls": len(calls),
+        "upstream_ms": round(sum(c["ms"] for c in calls), 1),
+        "db_queries": timings.db_queries,
+        "db_ms": round(timings.db_seconds * 1000, 1),
+        "cache_hits": timings.cache_hits,
+        "cache_misses": timings.cache_misses,
+        "calls": json.dumps(calls[:MAX_JOURNAL_CALLS]),
+    }
+    table = SlowRequest.__table__
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(table.insert().values(**row))
+            cutoff = conn.execute(
+                select(table.c.id).order_by(table.c.id.desc()).offset(SLOW_REQUEST_ROWS).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                conn.execute(table.delete().where(table.c.id <= cutoff))
+    except Exception as exc:
+        logger.warning("Could not record slow request %s %s: %s", request.method, request.path, exc)
+
+
+def _stop(exc=None):
+    token = g.pop("timings_token", None)
+    if token is not None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # torn down in a different context than it was set in
+
+
+def init_app(app):
+    """Collect timings for every request; register before admission control so queueing time counts."""
+    app.before_request(_start)
+    app.after_request(_add_headers)
+    app.teardown_request(_stop)
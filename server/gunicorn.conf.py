@@ -0,0 +1,8 @@
+# gunicorn settings beyond the command line in the Dockerfile.
+
+
+def post_worker_init(worker):
+    # Start this worker's scheduler as soon as it is ready, rather than on its first request.
+    from app import start_background_services
+
+    start_background_services()
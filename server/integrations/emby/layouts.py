@@ -1,7 +1,11 @@
 from typing import Any, Dict, List
+import asyncio
+import concurrent.futures
 import logging
+import os
 
-from favarr.services import server_request
+from favarr.aio import async_server_request, gather_async, run_async, submit_async
+from favarr.services import DeadlineExceeded, cached_value, server_request, server_snapshot
 
 
 DEFAULT_LAYOUT_IDS = (
@@ -12,6 +16,10 @@ DEFAULT_LAYOUT_IDS = (
     "latest",
 )
 
+BULK_USER_CONCURRENCY = int(os.environ.get("FAVARR_LAYOUT_BULK_USERS", "4"))  # users written at once
+
+CANDIDATE_IDS_TTL = 600  # seconds; also dropped when a /Library/ write invalidates libraries
+
 DEFAULT_CLIENT = "Emby Web"
 DEFAULT_DEVICE_ID = "faveswitch"
 
@@ -42,10 +50,7 @@ def _normalize_virtual_folders(raw) -> List[dict]:
 
 
 def _library_layout_ids(server) -> List[str]:
-    try:
-        folders = _normalize_virtual_folders(server_request(server, "/Library/VirtualFolders"))
-    except Exception:
-        return []
+    folders = _normalize_virtual_folders(server_request(server, "/Library/VirtualFolders"))
     ids = []
     for folder in folders:
         item_id = folder.get("ItemId") or folder.get("Id") or folder.get("id")
@@ -54,10 +59,10 @@ def _library_layout_ids(server) -> List[str]:
     return ids
 
 
-def _candidate_layout_ids(server) -> List[str]:
+def _combine_layout_ids(library_ids: List[str]) -> List[str]:
     seen = set()
     combined = []
-    for pref_id in list(DEFAULT_LAYOUT_IDS) + _library_layout_ids(server):
+    for pref_id in list(DEFAULT_LAYOUT_IDS) + library_ids:
         pref_id = str(pref_id)
         if pref_id in seen:
             continue
@@ -66,6 +71,21 @@ def _candidate_layout_ids(server) -> List[str]:
     return combined
 
 
+def _candidate_layout_ids(server) -> List[str]:
+    try:
+        return cached_value(
+            server,
+            "layout-candidates",
+            CANDIDATE_IDS_TTL,
+            lambda: _combine_layout_ids(_library_layout_ids(server)),
+            group="libraries",
+        )
+    except Exception as exc:
+        # Not cached, so the next call retries the library listing.
+        logger.warning("Could not list Emby libraries for layout ids: %s", exc)
+        return _combine_layout_ids([])
+
+
 def _is_not_found_error(exc: Exception) -> bool:
     msg = str(exc).lower()
     return "404" in msg or "not found" in msg
@@ -102,48 +122,50 @@ def set_display_pref(server, user_id, pref_id, body: Dict[str, Any], client: str
     )
 
 
-def load_all_layouts(server, user_id, client: str = None, device_id: str = None) -> Dict[str, Any]:
-    """Return a dict of all known display preference payloads for a user."""
-    _ensure_api_key(server)
+def _collect_layouts(user_id, candidate_ids: List[str], results: List[Any], client: str = None) -> Dict[str, Any]:
     layouts: Dict[str, Any] = {}
     unsupported: List[str] = []
-    candidate_ids = _candidate_layout_ids(server)
-    for pref_id in candidate_ids:
-        try:
-            layouts[pref_id] = get_display_pref(
-                server,
+    skipped: List[str] = []
+    for pref_id, result in zip(candidate_ids, results):
+        if not isinstance(result, Exception):
+            layouts[pref_id] = result
+        elif isinstance(result, DeadlineExceeded):
+            skipped.append(pref_id)
+        elif _is_not_found_error(result):
+            logger.warning(
+                "Emby display preference not found (user_id=%s, pref_id=%s, client=%s): %s",
                 user_id,
                 pref_id,
-                client=client,
-                device_id=device_id,
+                client or DEFAULT_CLIENT,
+                result,
             )
-        except Exception as exc:
-            if _is_not_found_error(exc):
-                logger.warning(
-                    "Emby display preference not found (user_id=%s, pref_id=%s, client=%s): %s",
-                    user_id,
-                    pref_id,
-                    client or DEFAULT_CLIENT,
-                    exc,
-                )
-                unsupported.append(pref_id)
-                continue
-            raise
+            unsupported.append(pref_id)
+        else:
+            raise result
     return {
         "layouts": layouts,
         "unsupported": unsupported,
+        "skipped": skipped,
+        "partial": bool(skipped),
         "candidates": candidate_ids,
     }
 
 
-def apply_layout_template(
-    server,
-    user_id,
-    template: Dict[str, Any],
-    client: str = None,
-    device_id: str = None,
-) -> Dict[str, Any]:
-    """Overwrite user layout preferences using template JSON."""
+def load_all_layouts(server, user_id, client: str = None, device_id: str = None) -> Dict[str, Any]:
+    """Return a dict of all known display preference payloads for a user; ones past the deadline are skipped."""
+    _ensure_api_key(server)
+    candidate_ids = _candidate_layout_ids(server)
+    snapshot = server_snapshot(server)
+    params = _layout_params(user_id, client=client, device_id=device_id)
+    results = gather_async(
+        async_server_request(snapshot, f"/DisplayPreferences/{pref_id}", params=params)
+        for pref_id in candidate_ids
+    )
+    return _collect_layouts(user_id, candidate_ids, results, client=client)
+
+
+def validate_layout_template(server, template: Dict[str, Any]):
+    """Raise ValueError unless template maps this server's preference ids to payloads."""
     _ensure_api_key(server)
     if not isinstance(template, dict):
         raise ValueError("Template must be an object mapping preference ids to payloads")
@@ -153,18 +175,176 @@ def apply_layout_template(
     if unsupported:
         raise ValueError(f"Unsupported display preference IDs: {', '.join(unsupported)}")
 
-    applied: List[str] = []
+
+async def _set_display_pref_async(server, user_id, pref_id, body, client: str = None, device_id: str = None):
+    if not isinstance(body, dict):
+        raise ValueError("Display preference body must be an object")
+    return await async_server_request(
+        server,
+        f"/DisplayPreferences/{pref_id}",
+        method="POST",
+        params=_layout_params(user_id, client=client, device_id=device_id),
+        data=body,
+    )
+
+
+def layout_diff(current: Any, desired: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Fields that differ between current and desired, in both directions, as [{path, before, after}]."""
+    if isinstance(desired, dict) and isinstance(current, dict):
+        changes = []
+        for key, value in desired.items():
+            key_path = f"{path}.{key}" if path else str(key)
+            if key not in current:
+                changes.append({"path": key_path, "before": None, "after": value})
+            else:
+                changes.extend(layout_diff(current[key], value, key_path))
+        for key, value in current.items():
+            if key not in desired:
+                changes.append({"path": f"{path}.{key}" if path else str(key), "before": value, "after": None})
+        return changes
+    if current == desired:
+        return []
+    return [{"path": path, "before": current, "after": desired}]
+
+
+async def _current_display_pref(server, user_id, pref_id, client: str = None, device_id: str = None):
+    # A preference the user has never saved diffs as entirely new, so it is
+    # written rather than skipped. Any other failure (deadline, open breaker)
+    # propagates: writing blind could clobber a preference we never saw.
+    try:
+        current = await async_server_request(
+            server,
+            f"/DisplayPreferences/{pref_id}",
+            params=_layout_params(user_id, client=client, device_id=device_id),
+            use_cache=False,
+        )
+    except Exception as exc:
+        if _is_not_found_error(exc):
+            return None
+        raise
+    return current if isinstance(current, dict) else None
+
+
+async def apply_layout_template_async(
+    server,
+    user_id,
+    template: Dict[str, Any],
+    client: str = None,
+    device_id: str = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Write the template preferences that differ from the user's current ones (none with dry_run)."""
+    pref_ids = [str(pref_id) for pref_id in template]
+    payloads = dict(zip(pref_ids, template.values()))
+    currents = await asyncio.gather(
+        *(_current_display_pref(server, user_id, pref_id, client=client, device_id=device_id) for pref_id in pref_ids),
+        return_exceptions=True,
+    )
+
     errors: List[Dict[str, str]] = []
-    for pref_id, payload in template.items():
-        pref_key = str(pref_id)
-        try:
-            set_display_pref(server, user_id, pref_key, payload, client=client, device_id=device_id)
-            applied.append(pref_key)
-        except Exception as exc:
-            errors.append({"id": pref_key, "error": str(exc)})
+    diffs: Dict[str, List[Dict[str, Any]]] = {}
+    unchanged: List[str] = []
+    for pref_id, current in zip(pref_ids, currents):
+        if not isinstance(payloads[pref_id], dict):
+            errors.append({"id": pref_id, "error": "Display preference body must be an object"})
+            continue
+        if isinstance(current, BaseException):
+            errors.append({"id": pref_id, "error": f"Could not read current preference: {current}"})
+            continue
+        diff = layout_diff(current, payloads[pref_id])
+        if diff:
+            diffs[pref_id] = diff
+        else:
+            unchanged.append(pref_id)
+
+    changed = list(diffs)
+    applied: List[str] = []
+    if not dry_run:
+        results = await asyncio.gather(
+            *(
+                _set_display_pref_async(server, user_id, pref_id, payloads[pref_id], client=client, device_id=device_id)
+                for pref_id in changed
+            ),
+            return_exceptions=True,
+        )
+        for pref_id, result in zip(changed, results):
+            if isinstance(result, Exception):
+                errors.append({"id": pref_id, "error": str(result)})
+            else:
+                applied.append(pref_id)
 
     return {
         "applied": applied,
         "errors": errors,
         "total": len(template),
+        "changed": changed,
+        "unchanged": unchanged,
+        "failed": [error["id"] for error in errors],
+        "diff": diffs,
+        "dry_run": dry_run,
     }
+
+
+def apply_layout_template(
+    server,
+    user_id,
+    template: Dict[str, Any],
+    client: str = None,
+    device_id: str = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Overwrite user layout preferences that differ from template JSON."""
+    validate_layout_template(server, template)
+    return run_async(
+        apply_layout_template_async(
+            server_snapshot(server), user_id, template, client=client, device_id=device_id, dry_run=dry_run
+        )
+    )
+
+
+def submit_bulk_apply(
+    server,
+    user_ids: List[str],
+    template: Dict[str, Any],
+    client: str = None,
+    device_id: str = None,
+    dry_run: bool = False,
+) -> Dict[concurrent.futures.Future, str]:
+    """Schedule a validated template for many users, BULK_USER_CONCURRENCY at a time; returns {future: user_id}."""
+    server = server_snapshot(server)
+    semaphore = asyncio.Semaphore(BULK_USER_CONCURRENCY)
+
+    async def apply_one(user_id):
+        async with semaphore:
+            return await apply_layout_template_async(
+                server, user_id, template, client=client, device_id=device_id, dry_run=dry_run
+            )
+
+    return {submit_async(apply_one(user_id)): str(user_id) for user_id in user_ids}
+
+
+def submit_bulk_capture(
+    server,
+    user_ids: List[str],
+    client: str = None,
+    device_id: str = None,
+) -> Dict[concurrent.futures.Future, str]:
+    """Schedule a layout load for many users, BULK_USER_CONCURRENCY at a time; returns {future: user_id}."""
+    _ensure_api_key(server)
+    candidate_ids = _candidate_layout_ids(server)
+    server = server_snapshot(server)
+    semaphore = asyncio.Semaphore(BULK_USER_CONCURRENCY)
+
+    async def capture_one(user_id):
+        params = _layout_params(user_id, client=client, device_id=device_id)
+        async with semaphore:
+            results = await asyncio.gather(
+                *(
+                    async_server_request(server, f"/DisplayPreferences/{pref_id}", params=params)
+                    for pref_id in candidate_ids
+                ),
+                return_exceptions=True,
+            )
+        return _collect_layouts(user_id, candidate_ids, results, client=client)
+
+    return {submit_async(capture_one(user_id)): str(user_id) for user_id in user_ids}